@@ -1,5 +1,5 @@
 import sys
-from typing import Set, List, Dict
+from typing import List, Dict
 
 from paas.middleware.base import MapProblem
 from paas.models import ProblemInstance, Task
@@ -52,7 +52,7 @@ class CycleRemover(MapProblem):
                 duration=task.duration,
                 predecessors=list(task.predecessors),  # Shallow copy
                 successors=list(task.successors),  # Shallow copy
-                compatible_teams=task.compatible_teams.copy(),
+                compatible_teams=task.compatible_teams,
             )
             new_tasks[task_id] = new_task
 
@@ -71,51 +71,59 @@ class CycleRemover(MapProblem):
     def _find_sccs(self, tasks: Dict[int, Task]) -> List[List[int]]:
         """
         Tarjan's algorithm to find SCCs.
+
+        The DFS is driven by an explicit stack of successor iterators, so
+        large strongly connected components (deep DFS paths) do not hit the
+        interpreter recursion limit.
         """
-        visited: Set[int] = set()
         stack: List[int] = []
-        on_stack: Set[int] = set()
         ids: Dict[int, int] = {}
+        # Nodes that were already assigned to an SCC get a low-link larger
+        # than any id, which removes the need for a separate on-stack set.
         low: Dict[int, int] = {}
+        done = len(tasks)
 
         sccs: List[List[int]] = []
-        id_counter = [0]
-
-        # Increase recursion limit just in case, though iterative would be better for huge graphs.
-        # Capturing current limit to restore? No, just setting it high enough is common in CP.
-        sys.setrecursionlimit(max(sys.getrecursionlimit(), len(tasks) + 1000))
-
-        def dfs(at: int):
-            stack.append(at)
-            on_stack.add(at)
-            visited.add(at)
-            ids[at] = id_counter[0]
-            low[at] = id_counter[0]
-            id_counter[0] += 1
-
-            for to in tasks[at].successors:
-                # 'to' might not exist in tasks if input is malformed, but assuming valid graph structure within tasks keys
-                if to not in tasks:
-                    continue
-
-                if to not in visited:
-                    dfs(to)
-                    low[at] = min(low[at], low[to])
-                elif to in on_stack:
-                    low[at] = min(low[at], ids[to])
-
-            if ids[at] == low[at]:
-                current_scc = []
-                while stack:
-                    node = stack.pop()
-                    on_stack.remove(node)
-                    current_scc.append(node)
-                    if node == at:
-                        break
-                sccs.append(current_scc)
+        id_counter = 0
 
-        for task_id in tasks:
-            if task_id not in visited:
-                dfs(task_id)
+        for root in tasks:
+            if root in ids:
+                continue
+
+            ids[root] = low[root] = id_counter
+            id_counter += 1
+            stack.append(root)
+            work = [(root, iter(tasks[root].successors))]
+
+            while work:
+                at, successors = work[-1]
+                for to in successors:
+                    if to in ids:
+                        if low[to] < low[at]:
+                            low[at] = low[to]
+                    # 'to' might not exist in tasks if input is malformed
+                    elif to in tasks:
+                        ids[to] = low[to] = id_counter
+                        id_counter += 1
+                        stack.append(to)
+                        work.append((to, iter(tasks[to].successors)))
+                        break
+                else:
+                    # All successors of 'at' are explored
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if low[at] < low[parent]:
+                            low[parent] = low[at]
+
+                    if ids[at] == low[at]:
+                        current_scc = []
+                        while True:
+                            node = stack.pop()
+                            low[node] = done
+                            current_scc.append(node)
+                            if node == at:
+                                break
+                        sccs.append(current_scc)
 
         return sccs
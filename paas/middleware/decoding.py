@@ -0,0 +1,102 @@
+import heapq
+import sys
+from typing import Dict, List, Optional, Tuple, Union
+
+from paas.models import Assignment
+
+
+def decode_deferred(
+    deferred: List[int],
+    predecessors: List[List[int]],
+    durations: List[int],
+    team_costs: List[List[int]],
+    team_assignment: List[int],
+    finish_times: Union[List[int], List[Optional[int]]],
+    team_available: List[int],
+    assignments: Optional[List[Assignment]],
+    unscheduled: Optional[int] = None,
+    makespan_limit: int = sys.maxsize,
+) -> Optional[Tuple[int, int, int]]:
+    """
+    Schedule the tasks a multi-pass list decoder has deferred, in the same
+    order further passes over `deferred` would. Shared by the hill climbing
+    and simulated annealing decoders.
+
+    `finish_times` holds the finish time of each task id, `unscheduled`
+    for the tasks not placed yet, and is updated along with
+    `team_available`. Placed tasks are appended to `assignments` if given.
+    Returns (count, makespan, cost) of the newly placed tasks, or None as
+    soon as a task would finish after makespan_limit.
+
+    Each task is keyed by the (pass, rank in `deferred`) at which a re-scan
+    would pick it up, and is pushed onto a heap once its last pending
+    predecessor is scheduled, instead of re-scanning once per pass.
+    """
+    rank: Dict[int, int] = {}
+    for r, task_id in enumerate(deferred):
+        rank.setdefault(task_id, r)
+
+    # Pending predecessors of each deferred task, and the reverse edges
+    waiting: Dict[int, int] = {}
+    dependents: Dict[int, List[int]] = {}
+    ready_time: Dict[int, int] = {}
+    heap: List[Tuple[int, int]] = []
+
+    for task_id, r in rank.items():
+        count = 0
+        preds_time = 0
+        for p in predecessors[task_id]:
+            finish = finish_times[p]
+            if finish is None or finish == unscheduled:
+                count += 1
+                dependents.setdefault(p, []).append(task_id)
+            elif finish > preds_time:
+                preds_time = finish
+        waiting[task_id] = count
+        ready_time[task_id] = preds_time
+        if not count:
+            heap.append((1, r))
+
+    heapq.heapify(heap)
+    ready_pass = dict.fromkeys(rank, 1)
+    num_placed = 0
+    makespan = 0
+    total_cost = 0
+
+    while heap:
+        pass_idx, r = heapq.heappop(heap)
+        task_id = deferred[r]
+
+        team_id = team_assignment[task_id]
+        if team_id < 0:
+            # No compatible team
+            continue
+
+        start_time = max(team_available[team_id], ready_time[task_id])
+        num_placed += 1
+        if assignments is not None:
+            assignments.append(Assignment(task_id, team_id, start_time))
+
+        finish_time = start_time + durations[task_id]
+        if finish_time > makespan_limit:
+            return None
+        finish_times[task_id] = finish_time
+        team_available[team_id] = finish_time
+        if finish_time > makespan:
+            makespan = finish_time
+        total_cost += team_costs[task_id][team_id]
+
+        for s in dependents.get(task_id, ()):
+            if finish_time > ready_time[s]:
+                ready_time[s] = finish_time
+            # A dependent ranked before this task is only reached again on
+            # the next pass.
+            s_rank = rank[s]
+            s_pass = pass_idx if s_rank > r else pass_idx + 1
+            if s_pass > ready_pass[s]:
+                ready_pass[s] = s_pass
+            waiting[s] -= 1
+            if not waiting[s]:
+                heapq.heappush(heap, (ready_pass[s], s_rank))
+
+    return num_placed, makespan, total_cost
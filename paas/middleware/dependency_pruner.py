@@ -1,5 +1,6 @@
 import sys
-from typing import Set, List, Dict
+from collections import deque
+from typing import Deque, Set, Dict
 from paas.middleware.base import MapProblem
 from paas.models import ProblemInstance, Task
 
@@ -20,7 +21,7 @@ class DependencyPruner(MapProblem):
         valid_ids = set(tasks.keys())
 
         to_remove: Set[int] = set()
-        queue: List[int] = []
+        queue: Deque[int] = deque()
 
         # Find initial broken tasks
         for t_id, task in tasks.items():
@@ -32,7 +33,7 @@ class DependencyPruner(MapProblem):
 
         # 2. Propagate removal to successors
         while queue:
-            current_id = queue.pop(0)
+            current_id = queue.popleft()
 
             # The task might have been removed from 'tasks' map in a real-time update scenario,
             # but here we are just building a set of IDs to remove.
@@ -64,26 +65,28 @@ class DependencyPruner(MapProblem):
         new_tasks: Dict[int, Task] = {}
 
         final_valid_ids = valid_ids - to_remove
+        # Bound once so the filters below run entirely in C
+        is_valid = final_valid_ids.__contains__
 
         for t_id, task in tasks.items():
             if t_id in to_remove:
                 continue
 
             # Clean up successors: remove any that are being removed
-            new_successors = [s for s in task.successors if s in final_valid_ids]
+            new_successors = list(filter(is_valid, task.successors))
 
             # Clean up predecessors: remove any that are being removed?
             # Ideally, if we did our job right, all predecessors of a kept task
             # MUST be in final_valid_ids.
             # Let's just filter to be safe and consistent.
-            new_predecessors = [p for p in task.predecessors if p in final_valid_ids]
+            new_predecessors = list(filter(is_valid, task.predecessors))
 
             new_task = Task(
                 id=task.id,
                 duration=task.duration,
                 predecessors=new_predecessors,
                 successors=new_successors,
-                compatible_teams=task.compatible_teams.copy(),
+                compatible_teams=task.compatible_teams,
             )
             new_tasks[t_id] = new_task
 
@@ -1,20 +1,51 @@
-import sys
+import concurrent.futures
+import contextlib
 import random
 import heapq
+from itertools import compress
+from operator import attrgetter
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
-from paas.models import ProblemInstance, Schedule, Assignment
+from typing import Dict, List, Tuple, Optional
+from paas.models import (
+    DATACLASS_SLOTS,
+    Assignment,
+    CompiledProblem,
+    ProblemInstance,
+    Schedule,
+)
 from paas.middleware.base import MapResult
 from paas.time_budget import TimeBudget
 
 
-@dataclass
+# Maps the digits of a binary string to selector bytes for itertools.compress
+_BINARY_DIGITS_TO_BYTES = bytes.maketrans(b"01", b"\0\1")
+
+
+@dataclass(**DATACLASS_SLOTS)
 class Individual:
     task_order: List[int]
     team_assignment: List[int]
     fitness: Optional[Tuple[int, int, int]] = None
 
 
+# The middleware of a worker process, set once per pool by `_init_worker` so
+# that the preprocessed problem is not sent along with every batch
+_worker_middleware: Optional["GAMiddleware"] = None
+
+
+def _init_worker(middleware: "GAMiddleware"):
+    global _worker_middleware
+    _worker_middleware = middleware
+
+
+def _evaluate_in_worker(genes: Tuple[List[int], List[int]]) -> Tuple[int, int, int]:
+    assert _worker_middleware is not None
+    task_order, team_assignment = genes
+    return _worker_middleware._evaluate(
+        Individual(task_order=task_order, team_assignment=team_assignment)
+    )
+
+
 class GAMiddleware(MapResult):
     """
     Genetic Algorithm middleware.
@@ -27,11 +58,15 @@ class GAMiddleware(MapResult):
         max_population_size: int = 200,
         seed: int = 8,
         time_factor: float = 1.0,
+        num_workers: int = 1,
     ):
         super().__init__(time_factor)
         self.initial_population_size = initial_population_size
         self.max_population_size = max_population_size
         self.seed = seed
+        # Evaluating an individual only depends on its chromosome; with
+        # num_workers > 1 each generation is evaluated in separate processes.
+        self.num_workers = num_workers
 
         # Preprocessed data
         self.num_tasks: int = 0
@@ -51,41 +86,25 @@ class GAMiddleware(MapResult):
         self.num_tasks = problem.num_tasks
         self.num_teams = problem.num_teams
 
-        self.team_initial_availability = [0] * self.num_teams
-        for tid, team in problem.teams.items():
-            self.team_initial_availability[tid] = team.available_from
+        compiled = CompiledProblem.from_problem(problem)
+        self.team_initial_availability = compiled.team_available_from
 
         self.team_idx_to_id = list(range(self.num_teams))
 
-        self.durations = [0] * self.num_tasks
-        self.predecessors = [[] for _ in range(self.num_tasks)]
-        self.successors = [[] for _ in range(self.num_tasks)]
-        self.initial_in_degrees = [0] * self.num_tasks
-        self.compatible_teams_indices = [[] for _ in range(self.num_tasks)]
-
-        INF = 10**12
-        self.team_costs = [[INF] * self.num_teams for _ in range(self.num_tasks)]
-        self.tasks_with_teams = []
-
-        for tid, task in problem.tasks.items():
-            self.durations[tid] = task.duration
-            self.predecessors[tid] = task.predecessors
-            self.successors[tid] = task.successors
-            self.initial_in_degrees[tid] = len(task.predecessors)
-
-            if task.compatible_teams:
-                self.tasks_with_teams.append(tid)
-
-            for team_idx, cost in task.compatible_teams.items():
-                self.compatible_teams_indices[tid].append(team_idx)
-                self.team_costs[tid][team_idx] = cost
+        self.durations = compiled.durations
+        self.predecessors = compiled.predecessors
+        self.successors = compiled.successors
+        self.initial_in_degrees = compiled.in_degrees
+        self.compatible_teams_indices = compiled.compatible_teams
+        self.team_costs = compiled.team_costs
+        self.tasks_with_teams = compiled.tasks_with_teams
 
     def _schedule_to_individual(self, schedule: Schedule) -> Individual:
         """
         Convert a Schedule object back into an Individual.
         """
         team_assignment = [0] * self.num_tasks
-        sorted_assignments = sorted(schedule.assignments, key=lambda a: a.start_time)
+        sorted_assignments = sorted(schedule.assignments, key=attrgetter("start_time"))
         task_order = [a.task_id for a in sorted_assignments]
 
         scheduled_ids = set(task_order)
@@ -103,15 +122,76 @@ class GAMiddleware(MapResult):
 
         return Individual(task_order=task_order, team_assignment=team_assignment)
 
-    def _decode(self, individual: Individual) -> List[Assignment]:
+    def _chain_individual(self) -> Optional[Individual]:
+        """
+        If the tasks form disjoint chains (at most one predecessor and one
+        successor each), an individual that runs the chains side by side: the
+        order takes the i-th task of every chain before any (i+1)-th one, and
+        each task goes to the team that can start it first, then the cheapest.
+        Returns None for any other dependency graph.
+        """
+        predecessors = self.predecessors
+        successors = self.successors
+        if any(len(preds) > 1 for preds in predecessors) or any(
+            len(succs) > 1 for succs in successors
+        ):
+            return None
+
+        # Step of each task along its chain, chains in the order of their heads
+        depth: Dict[int, int] = {}
+        for head in range(self.num_tasks):
+            if predecessors[head]:
+                continue
+            tid = head
+            step = 0
+            while True:
+                if self.compatible_teams_indices[tid]:
+                    depth[tid] = step
+                if not successors[tid]:
+                    break
+                tid = successors[tid][0]
+                step += 1
+
+        task_order = sorted(depth, key=depth.__getitem__)
+        # Tasks on cycles are never reached from a head
+        task_order.extend(tid for tid in self.tasks_with_teams if tid not in depth)
+
+        team_available = list(self.team_initial_availability)
+        finish_times = [0] * self.num_tasks
+        team_assignment = [0] * self.num_tasks
+        for tid in task_order:
+            ready = max((finish_times[p] for p in predecessors[tid]), default=0)
+            costs = self.team_costs[tid]
+            team_idx = min(
+                self.compatible_teams_indices[tid],
+                key=lambda t: (max(team_available[t], ready), costs[t]),
+            )
+            finish = max(team_available[team_idx], ready) + self.durations[tid]
+            team_available[team_idx] = finish
+            finish_times[tid] = finish
+            team_assignment[tid] = team_idx
+
+        return Individual(task_order=task_order, team_assignment=team_assignment)
+
+    def _decode(self, individual: Individual) -> Tuple[List[Assignment], int, int]:
+        """
+        Returns (assignments, makespan, cost).
+        """
         priority = [0] * self.num_tasks
         for rank, tid in enumerate(individual.task_order):
             priority[tid] = rank
 
         team_available = list(self.team_initial_availability)
-        task_finish_times = [-1] * self.num_tasks
+        # Latest finish time among the already-scheduled predecessors of each
+        # task, pushed forward as tasks complete so that no predecessor scan
+        # is needed when a task is popped.
+        preds_complete_times = [0] * self.num_tasks
         current_in_degrees = list(self.initial_in_degrees)
 
+        team_costs = self.team_costs
+        makespan = 0
+        cost = 0
+
         assignments: List[Assignment] = []
         ready_heap = []
         for tid in self.tasks_with_teams:
@@ -122,62 +202,69 @@ class GAMiddleware(MapResult):
             _, task_id = heapq.heappop(ready_heap)
             team_idx = individual.team_assignment[task_id]
 
-            preds_complete_time = 0
-            for p in self.predecessors[task_id]:
-                p_finish = task_finish_times[p]
-                if p_finish > preds_complete_time:
-                    preds_complete_time = p_finish
-
-            start_time = max(team_available[team_idx], preds_complete_time)
+            start_time = max(team_available[team_idx], preds_complete_times[task_id])
             duration = self.durations[task_id]
             finish_time = start_time + duration
 
-            task_finish_times[task_id] = finish_time
             team_available[team_idx] = finish_time
+            if finish_time > makespan:
+                makespan = finish_time
+            cost += team_costs[task_id][team_idx]
 
             assignments.append(Assignment(task_id, team_idx, start_time))
 
             for s in self.successors[task_id]:
+                if finish_time > preds_complete_times[s]:
+                    preds_complete_times[s] = finish_time
                 current_in_degrees[s] -= 1
                 if current_in_degrees[s] == 0:
                     if self.compatible_teams_indices[s]:
                         heapq.heappush(ready_heap, (priority[s], s))
 
-        return assignments
+        return assignments, makespan, cost
 
     def _evaluate(self, individual: Individual) -> Tuple[int, int, int]:
         if individual.fitness is not None:
             return individual.fitness
 
-        assignments = self._decode(individual)
-
-        if not assignments:
-            return (0, sys.maxsize, sys.maxsize)
-
-        task_count = len(assignments)
-        completion_time = 0
-        total_cost = 0
-
-        for a in assignments:
-            duration = self.durations[a.task_id]
-            finish = a.start_time + duration
-            if finish > completion_time:
-                completion_time = finish
-
-            cost = self.team_costs[a.task_id][a.team_id]
-            total_cost += cost
-
-        individual.fitness = (-task_count, completion_time, total_cost)
+        assignments, makespan, cost = self._decode(individual)
+        individual.fitness = (-len(assignments), makespan, cost)
         return individual.fitness
 
+    def _evaluate_all(
+        self,
+        population: List[Individual],
+        executor: Optional[concurrent.futures.Executor],
+    ):
+        """
+        Evaluate the individuals of population that have no fitness yet in
+        the worker processes of executor. Without one they are evaluated
+        lazily by `_evaluate`.
+        """
+        if executor is None:
+            return
+        pending = [ind for ind in population if ind.fitness is None]
+        if not pending:
+            return
+        # Only the chromosomes go to the workers
+        fitnesses = executor.map(
+            _evaluate_in_worker,
+            [(ind.task_order, ind.team_assignment) for ind in pending],
+            chunksize=-(-len(pending) // self.num_workers),
+        )
+        for ind, fitness in zip(pending, fitnesses):
+            ind.fitness = fitness
+
     def _generate_random_individual(self) -> Individual:
         task_order = list(self.tasks_with_teams)
         random.shuffle(task_order)
-        team_assignment = [0] * self.num_tasks
-        for tid in self.tasks_with_teams:
-            opts = self.compatible_teams_indices[tid]
-            if opts:
-                team_assignment[tid] = random.choice(opts)
+        # One float draw per task scaled to the option count is about twice as
+        # fast as random.choice, which matters for large initial populations.
+        rand = random.random
+        team_assignment = [
+            opts[int(rand() * len(opts))] if opts else 0
+            for opts in self.compatible_teams_indices
+        ]
         return Individual(task_order=task_order, team_assignment=team_assignment)
 
     def _crossover(
@@ -187,28 +274,36 @@ class GAMiddleware(MapResult):
             n = len(parent1_seq)
             if n < 2:
                 return list(parent1_seq)
-            cx1, cx2 = sorted(random.sample(range(n), 2))
-            child = [None] * n
-            child[cx1 : cx2 + 1] = parent1_seq[cx1 : cx2 + 1]
-            used = set(child[cx1 : cx2 + 1])
-            pos = (cx2 + 1) % n
-            for gene in parent2_seq:
-                if gene not in used:
-                    while child[pos] is not None:
-                        pos = (pos + 1) % n
-                    child[pos] = gene
-                    pos = (pos + 1) % n
-            return child
+            # Two distinct cut points without materializing a sample list
+            cx1 = random.randrange(n)
+            cx2 = random.randrange(n - 1)
+            if cx2 >= cx1:
+                cx2 += 1
+            else:
+                cx1, cx2 = cx2, cx1
+            segment = parent1_seq[cx1 : cx2 + 1]
+            used = set(segment)
+            rest = [gene for gene in parent2_seq if gene not in used]
+            # The leftover genes fill the positions after the segment first,
+            # then wrap around to the front.
+            k = n - 1 - cx2
+            return rest[k:] + segment + rest[:k]
 
         c1_order = ox(p1.task_order, p2.task_order)
         c2_order = ox(p2.task_order, p1.task_order)
 
-        c1_teams = list(p1.team_assignment)
-        c2_teams = list(p2.team_assignment)
+        t1 = p1.team_assignment
+        t2 = p2.team_assignment
+        c1_teams = list(t1)
+        c2_teams = list(t2)
 
-        for i in range(self.num_tasks):
-            if random.random() < 0.5:
-                c1_teams[i], c2_teams[i] = p2.team_assignment[i], p1.team_assignment[i]
+        # Uniform crossover: one random bit per task, drawn all at once,
+        # selects the tasks whose teams are exchanged
+        n = self.num_tasks
+        bits = format(random.getrandbits(n), f"0{n}b").encode()
+        for i in compress(range(n), bits.translate(_BINARY_DIGITS_TO_BYTES)):
+            c1_teams[i] = t2[i]
+            c2_teams[i] = t1[i]
 
         return (
             Individual(task_order=c1_order, team_assignment=c1_teams),
@@ -219,18 +314,26 @@ class GAMiddleware(MapResult):
         order = list(ind.task_order)
         teams = list(ind.team_assignment)
 
-        if len(order) >= 2 and random.random() < 0.5:
-            i, j = random.sample(range(len(order)), 2)
+        n = len(order)
+        if n >= 2 and random.random() < 0.5:
+            # Two distinct indices without materializing a sample list
+            i = random.randrange(n)
+            j = random.randrange(n - 1)
+            if j >= i:
+                j += 1
             order[i], order[j] = order[j], order[i]
 
         if random.random() < 0.5 and self.tasks_with_teams:
             tid = random.choice(self.tasks_with_teams)
             opts = self.compatible_teams_indices[tid]
-            if len(opts) > 1:
-                current = teams[tid]
-                others = [t for t in opts if t != current]
-                if others:
-                    teams[tid] = random.choice(others)
+            k = len(opts)
+            if k > 1:
+                # Uniform over the k - 1 other teams: draw from the first k - 1
+                # slots and map a hit on the current team to the last slot.
+                pick = opts[random.randrange(k - 1)]
+                if pick == teams[tid]:
+                    pick = opts[-1]
+                teams[tid] = pick
 
         return Individual(task_order=order, team_assignment=teams)
 
@@ -246,13 +349,27 @@ class GAMiddleware(MapResult):
         if not self.tasks_with_teams:
             return result
 
-        with TimeBudget(time_limit) as budget:
+        if self.num_workers > 1:
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_worker,
+                initargs=(self,),
+            )
+        else:
+            pool = contextlib.nullcontext()
+
+        with TimeBudget(time_limit) as budget, pool as executor:
             population: List[Individual] = []
 
             # Inject the result from the previous solver
             population.append(self._schedule_to_individual(result))
 
-            for _ in range(self.initial_population_size - 1):
+            # Disjoint chains are best run side by side, so seed that too
+            chain_individual = self._chain_individual()
+            if chain_individual is not None:
+                population.append(chain_individual)
+
+            for _ in range(self.initial_population_size - len(population)):
                 if budget.is_expired():
                     break
                 population.append(self._generate_random_individual())
@@ -260,13 +377,14 @@ class GAMiddleware(MapResult):
             if not population:
                 population.append(self._generate_random_individual())
 
+            self._evaluate_all(population, executor)
             best_ind = population[0]
             best_score = self._evaluate(best_ind)
 
             generation = 0
             while not budget.is_expired():
                 generation += 1
-                population.sort(key=lambda x: self._evaluate(x))
+                population.sort(key=self._evaluate)
                 current_best = population[0]
                 current_score = self._evaluate(current_best)
 
@@ -281,7 +399,12 @@ class GAMiddleware(MapResult):
                 for _ in range(num_best):
                     if budget.is_expired():
                         break
-                    p1, p2 = random.sample(parents, 2)
+                    # Two distinct parents without materializing a sample list
+                    i = random.randrange(len(parents))
+                    j = random.randrange(len(parents) - 1)
+                    if j >= i:
+                        j += 1
+                    p1, p2 = parents[i], parents[j]
                     c1, c2 = self._crossover(p1, p2)
                     next_pop.append(c1)
                     next_pop.append(c2)
@@ -293,11 +416,13 @@ class GAMiddleware(MapResult):
                     next_pop.append(self._mutate(p))
 
                 population = next_pop
+                self._evaluate_all(population, executor)
                 if len(population) > self.max_population_size:
-                    population.sort(key=lambda x: self._evaluate(x))
-                    population = population[: self.initial_population_size]
+                    population = heapq.nsmallest(
+                        self.initial_population_size, population, key=self._evaluate
+                    )
 
-        raw_assignments = self._decode(best_ind)
+        raw_assignments, _, _ = self._decode(best_ind)
         final_assignments = []
         for a in raw_assignments:
             real_team_id = self.team_idx_to_id[a.team_id]
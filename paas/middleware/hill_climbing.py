@@ -1,9 +1,10 @@
 import random
 import sys
-from typing import List, Dict, Tuple
+from typing import List, Optional, Set, Tuple
 
 from paas.middleware.base import MapResult
-from paas.models import ProblemInstance, Schedule, Assignment
+from paas.middleware.decoding import decode_deferred
+from paas.models import Assignment, CompiledProblem, ProblemInstance, Schedule
 from paas.time_budget import TimeBudget
 
 
@@ -24,10 +25,26 @@ class HillClimbingMiddleware(MapResult):
         iterations: int = 50,
         time_factor: float = 0.5,
         seed: int = 42,
+        seen_states_size: int = 50000,
     ):
         super().__init__(time_factor)
         self.iterations = iterations
         self.seed = seed
+        # At most this many state fingerprints are kept (see `map_result`)
+        self.seen_states_size = seen_states_size
+
+        # Flattened problem data (see `_preprocess`)
+        self.durations: List[int] = []
+        self.predecessors: List[List[int]] = []
+        self.team_costs: List[List[int]] = []
+        self.compatible_teams: List[List[int]] = []
+        self.team_initial_availability: List[int] = []
+
+        # First-pass checkpoints of the current state (see `_decode`)
+        self._checkpoints: List[Tuple[int, int, int, int, List[int], List[int]]] = []
+        self._checkpoint_stride = 1
+        self._recorded_assignments: List[Assignment] = []
+        self._recorded_deferred: List[int] = []
 
     def map_result(
         self,
@@ -42,13 +59,19 @@ class HillClimbingMiddleware(MapResult):
             return result
 
         random.seed(self.seed)
+        self._preprocess(problem)
 
         # 1. Convert Schedule to internal representation (Order + Team Map)
         # Sort assignments by start_time to get a valid execution order
         sorted_assignments = sorted(result.assignments, key=lambda a: a.start_time)
 
         task_order = [a.task_id for a in sorted_assignments]
-        team_assignment = {a.task_id: a.team_id for a in sorted_assignments}
+        # Team per task id, -1 for tasks without a compatible team
+        team_assignment = [-1] * problem.num_tasks
+        for a in sorted_assignments:
+            team_assignment[a.task_id] = a.team_id
+        # Tasks that have a team, in the order they were assigned one
+        team_task_ids = list(task_order)
 
         # Include unscheduled tasks
         scheduled_ids = set(task_order)
@@ -59,18 +82,38 @@ class HillClimbingMiddleware(MapResult):
         full_task_order = task_order + missing_ids
 
         for tid in missing_ids:
-            compat = list(problem.tasks[tid].compatible_teams.keys())
+            compat = self.compatible_teams[tid]
             if compat:
                 team_assignment[tid] = random.choice(compat)
+                team_task_ids.append(tid)
 
         current_order = full_task_order
         current_teams = team_assignment
 
-        # Evaluate initial
+        # Evaluate initial, recording checkpoints that neighbors resume from
         current_assignments, current_score = self._evaluate(
-            problem, current_order, current_teams
+            problem, current_order, current_teams, record=True
         )
 
+        # Fingerprints of the states scored so far. Only strict improvements
+        # are accepted, so none of them can beat the current state any more.
+        # A fingerprint is the XOR of the hash of one term per (position,
+        # task) and per (task, team), which a move updates by swapping out a
+        # few terms. It is not an exact identity: two states can collide,
+        # and a neighbor whose fingerprint was already seen is skipped
+        # without being scored. With 64-bit hashes and at most
+        # seen_states_size (5e4) entries, the odds of that are about 1e-10
+        # per run if the fingerprints spread uniformly.
+        # Once full, the set is emptied rather than grown without bound.
+        current_hash = 0
+        for pos, tid in enumerate(current_order):
+            current_hash ^= hash((pos, tid))
+        for tid, team in enumerate(current_teams):
+            current_hash ^= hash((tid, team, 0))
+        seen: Set[int] = {current_hash}
+
+        randrange = random.randrange
+
         with TimeBudget(time_limit) as budget:
             for _ in range(self.iterations):
                 if budget.is_expired():
@@ -84,39 +127,78 @@ class HillClimbingMiddleware(MapResult):
                     for _ in range(swap_attempts):
                         if budget.is_expired():
                             break
-                        i, j = random.sample(range(n), 2)
-
-                        neighbor_order = list(current_order)
-                        neighbor_order[i], neighbor_order[j] = (
-                            neighbor_order[j],
-                            neighbor_order[i],
+                        # Two distinct positions without building a sample list
+                        i = randrange(n)
+                        j = randrange(n - 1)
+                        if j >= i:
+                            j += 1
+                        a = current_order[i]
+                        b = current_order[j]
+                        neighbor_hash = (
+                            current_hash
+                            ^ hash((i, a))
+                            ^ hash((j, b))
+                            ^ hash((i, b))
+                            ^ hash((j, a))
                         )
+                        if neighbor_hash in seen:
+                            continue
+                        if len(seen) >= self.seen_states_size:
+                            seen.clear()
+                        seen.add(neighbor_hash)
+                        if self._swap_is_noop(
+                            current_order, current_teams, min(i, j), max(i, j)
+                        ):
+                            # Same schedule, so it cannot be an improvement
+                            continue
 
-                        _, neighbor_score = self._evaluate(
-                            problem, neighbor_order, current_teams
+                        # Swap in place and undo it if the neighbor is rejected
+                        current_order[i], current_order[j] = b, a
+
+                        # Positions before min(i, j) decode exactly as before
+                        neighbor_score = self._neighbor_score(
+                            problem,
+                            current_order,
+                            current_teams,
+                            min(i, j),
+                            current_score,
+                            0,
                         )
 
-                        if neighbor_score < current_score:
-                            current_order = neighbor_order
-                            current_score = neighbor_score
+                        if (
+                            neighbor_score is not None
+                            and neighbor_score < current_score
+                        ):
+                            current_assignments, current_score = self._evaluate(
+                                problem, current_order, current_teams, record=True
+                            )
+                            current_hash = neighbor_hash
                             improved = True
                             break
 
+                        current_order[i], current_order[j] = a, b
+
                 if improved:
                     continue
 
                 # 2. Team Change Neighbors
-                tasks_to_try = random.sample(
-                    list(current_teams.keys()), min(len(current_teams), 10)
-                )
-                for tid in tasks_to_try:
+                # Partial Fisher-Yates: the first few slots of team_task_ids
+                # become a uniform sample without allocating a new list
+                num_team_tasks = len(team_task_ids)
+                for k in range(min(num_team_tasks, 10)):
                     if budget.is_expired():
                         break
-                    if tid not in problem.tasks:
-                        continue
+                    p = randrange(k, num_team_tasks)
+                    team_task_ids[k], team_task_ids[p] = (
+                        team_task_ids[p],
+                        team_task_ids[k],
+                    )
+                    tid = team_task_ids[k]
 
                     current_team = current_teams[tid]
-                    compat = list(problem.tasks[tid].compatible_teams.keys())
+                    compat = self.compatible_teams[tid]
+                    # The team of tid is not read before its position
+                    tid_pos = current_order.index(tid)
 
                     better_found = False
                     for new_team in compat:
@@ -124,134 +206,318 @@ class HillClimbingMiddleware(MapResult):
                             break
                         if new_team == current_team:
                             continue
-
-                        neighbor_teams = dict(current_teams)
-                        neighbor_teams[tid] = new_team
-
-                        _, neighbor_score = self._evaluate(
-                            problem, current_order, neighbor_teams
+                        neighbor_hash = (
+                            current_hash
+                            ^ hash((tid, current_team, 0))
+                            ^ hash((tid, new_team, 0))
+                        )
+                        if neighbor_hash in seen:
+                            continue
+                        if len(seen) >= self.seen_states_size:
+                            seen.clear()
+                        seen.add(neighbor_hash)
+
+                        # Change the team in place, restored below on reject
+                        current_teams[tid] = new_team
+
+                        neighbor_score = self._neighbor_score(
+                            problem,
+                            current_order,
+                            current_teams,
+                            tid_pos,
+                            current_score,
+                            self.team_costs[tid][new_team]
+                            - self.team_costs[tid][current_team],
                         )
 
-                        if neighbor_score < current_score:
-                            current_teams = neighbor_teams
-                            current_score = neighbor_score
+                        if (
+                            neighbor_score is not None
+                            and neighbor_score < current_score
+                        ):
+                            current_assignments, current_score = self._evaluate(
+                                problem, current_order, current_teams, record=True
+                            )
+                            current_hash = neighbor_hash
                             improved = True
                             better_found = True
                             break
 
+                        current_teams[tid] = current_team
+
                     if better_found:
                         break
 
                 if not improved:
                     break
 
-        best_assignments, _ = self._evaluate(problem, current_order, current_teams)
-        return Schedule(assignments=best_assignments)
+        # The current state was last decoded when it was accepted
+        return Schedule(assignments=current_assignments)
+
+    def _preprocess(self, problem: ProblemInstance):
+        """
+        Flatten the problem into lists indexed by task / team id, so that the
+        decoder indexes lists instead of hashing into dicts.
+        """
+        problem.assert_continuous_indices()
+
+        compiled = CompiledProblem.from_problem(problem)
+        self.durations = compiled.durations
+        self.predecessors = compiled.predecessors
+        self.team_costs = compiled.team_costs
+        self.compatible_teams = compiled.compatible_teams
+        self.team_initial_availability = compiled.team_available_from
+
+    def _commutes(self, a: int, b: int, team_assignment: List[int]) -> bool:
+        """
+        Whether tasks a and b decode the same in either adjacent order: they
+        use different teams and neither is a direct predecessor of the other.
+        """
+        return (
+            team_assignment[a] != team_assignment[b]
+            and a not in self.predecessors[b]
+            and b not in self.predecessors[a]
+        )
+
+    def _swap_is_noop(
+        self, task_order: List[int], team_assignment: List[int], i: int, j: int
+    ) -> bool:
+        """
+        Whether swapping positions i < j leaves the decoded schedule unchanged.
+
+        The swap is a chain of adjacent transpositions: task_order[i] moves
+        right past positions i+1..j, then task_order[j] moves left past
+        i+1..j-1. If every transposed pair commutes, the decode is identical.
+        """
+        a = task_order[i]
+        b = task_order[j]
+        if not self._commutes(a, b, team_assignment):
+            return False
+        for k in range(i + 1, j):
+            c = task_order[k]
+            if not (
+                self._commutes(a, c, team_assignment)
+                and self._commutes(b, c, team_assignment)
+            ):
+                return False
+        return True
 
     def _evaluate(
         self,
         problem: ProblemInstance,
         task_order: List[int],
-        team_assignment: Dict[int, int],
+        team_assignment: List[int],
+        start: int = 0,
+        record: bool = False,
     ) -> Tuple[List[Assignment], Tuple[int, int, int]]:
         """
         Decode and evaluate.
         Returns (assignments, (neg_count, makespan, cost))
         """
-        assignments = self._decode(problem, task_order, team_assignment)
-
-        if not assignments:
-            return [], (0, sys.maxsize, sys.maxsize)
-
-        count = len(assignments)
-        makespan = 0
-        cost = 0
-
-        for a in assignments:
-            task = problem.tasks[a.task_id]
-            finish = a.start_time + task.duration
-            if finish > makespan:
-                makespan = finish
+        decoded = self._decode(
+            problem, task_order, team_assignment, start=start, record=record
+        )
+        # Only a makespan limit can abort the decode
+        assert decoded is not None
+        assignments, makespan, cost = decoded
+        return assignments, (-len(assignments), makespan, cost)
 
-            c = task.compatible_teams.get(a.team_id, 10**12)
-            cost += c
+    def _neighbor_score(
+        self,
+        problem: ProblemInstance,
+        task_order: List[int],
+        team_assignment: List[int],
+        start: int,
+        current_score: Tuple[int, int, int],
+        cost_delta: int,
+    ) -> Optional[Tuple[int, int, int]]:
+        """
+        Score a neighbor of the current state, or return None when it cannot
+        beat current_score.
+
+        Swaps and team changes never change which tasks get scheduled (that
+        only depends on the dependencies and on tasks having a team), and the
+        neighbor's cost is the current one plus cost_delta (0 for swaps). So
+        unless the cost drops, the neighbor must finish strictly earlier, and
+        its decode is abandoned as soon as a task finishes too late.
+        """
+        makespan_limit = current_score[1]
+        if cost_delta >= 0:
+            makespan_limit -= 1
+
+        decoded = self._decode(
+            problem,
+            task_order,
+            team_assignment,
+            start=start,
+            makespan_limit=makespan_limit,
+        )
+        if decoded is None:
+            return None
 
-        return assignments, (-count, makespan, cost)
+        assignments, makespan, cost = decoded
+        return (-len(assignments), makespan, cost)
 
     def _decode(
         self,
         problem: ProblemInstance,
         task_order: List[int],
-        team_assignment: Dict[int, int],
-    ) -> List[Assignment]:
+        team_assignment: List[int],
+        start: int = 0,
+        record: bool = False,
+        makespan_limit: int = sys.maxsize,
+    ) -> Optional[Tuple[List[Assignment], int, int]]:
         """
         Greedy decoder respecting task_order priorities.
+        Returns (assignments, makespan, cost), or None as soon as a task would
+        finish after makespan_limit.
+
+        Loop through the list, scheduling every task whose predecessors are
+        done and retrying the rest in the next pass. Once a pass places only
+        a small share of what is pending, the remaining passes are resolved
+        from a heap instead (see `decode_deferred`).
+
+        With `record`, the state of the first pass is checkpointed every
+        `_checkpoint_stride` positions. A later call whose order and teams
+        only differ from that state at positions >= `start` resumes the
+        first pass from the closest checkpoint instead of position 0.
         """
-        scheduled_finishes: Dict[int, int] = {}
-        assignments: List[Assignment] = []
-
-        # Track team availability
-        team_available = {
-            tid: team.available_from for tid, team in problem.teams.items()
-        }
-
-        # We iterate through task_order.
-        # But we can only schedule a task if its predecessors are done.
-        # Standard list scheduling with priority list:
-        # Loop through list, pick first ready task, schedule it, repeat.
-
-        pending = list(task_order)
-
-        while pending:
-            progress = False
+        durations = self.durations
+        predecessors = self.predecessors
+        team_costs = self.team_costs
+
+        checkpoint = None
+        if start and self._checkpoints:
+            checkpoint = self._checkpoints[start // self._checkpoint_stride]
+
+        if checkpoint is not None:
+            pos, num_assigned, num_deferred, cost, finishes, available = checkpoint
+            assignments = self._recorded_assignments[:num_assigned]
+            next_pending = self._recorded_deferred[:num_deferred]
+            finish_times = finishes[:]
+            team_available = available[:]
+        else:
+            pos = 0
+            assignments = []
             next_pending = []
+            cost = 0
+            # Finish time per task id, -1 while the task is not scheduled
+            finish_times = [-1] * len(durations)
+            # Track team availability
+            team_available = list(self.team_initial_availability)
+
+        checkpoints = []
+        num_positions = len(task_order)
+        stride = max(1, int(num_positions**0.5))
+        first_pass_deferred = next_pending
+
+        # Positions (in task_order) of the tasks still to be scheduled
+        pending = range(pos, num_positions)
+        # When recording, the first pass runs in stride-long segments with a
+        # checkpoint before each one, keeping that test out of the task loop.
+        # Checkpoint i is taken at position i * stride, so only a decode
+        # from the start of the order can record them.
+        recording = record and pos == 0
+        if recording:
+            segments = [
+                range(seg_start, min(seg_start + stride, num_positions))
+                for seg_start in range(pos, num_positions, stride)
+            ]
+        else:
+            segments = [pending]
+        placed_before = 0
 
-            for task_id in pending:
-                # Check if already scheduled (shouldn't happen with correct logic but safety)
-                if task_id in scheduled_finishes:
-                    continue
-
-                task = problem.tasks.get(task_id)
-                if not task:
-                    continue
+        while pending:
+            for segment in segments:
+                if recording:
+                    # Recorded segments are non-empty ranges of positions
+                    checkpoints.append(
+                        (
+                            segment[0],
+                            len(assignments),
+                            len(next_pending),
+                            cost,
+                            finish_times[:],
+                            team_available[:],
+                        )
+                    )
 
-                # Check predecessors
-                preds_ready = True
-                preds_time = 0
-                for p in task.predecessors:
-                    if p not in scheduled_finishes:
-                        preds_ready = False
-                        break
-                    if scheduled_finishes[p] > preds_time:
-                        preds_time = scheduled_finishes[p]
+                for pos in segment:
+                    task_id = task_order[pos]
+                    # Check if already scheduled (shouldn't happen with correct logic but safety)
+                    if finish_times[task_id] >= 0:
+                        continue
 
-                if not preds_ready:
-                    next_pending.append(task_id)
-                    continue
+                    # Check predecessors
+                    preds_ready = True
+                    preds_time = 0
+                    for p in predecessors[task_id]:
+                        finish = finish_times[p]
+                        if finish < 0:
+                            preds_ready = False
+                            break
+                        if finish > preds_time:
+                            preds_time = finish
 
-                # Schedule
-                team_id = team_assignment.get(task_id)
-                if team_id is None:
-                    # Should not happen if initialized correctly
-                    continue
+                    if not preds_ready:
+                        next_pending.append(pos)
+                        continue
 
-                if team_id not in team_available:
-                    # Invalid team?
-                    continue
+                    # Schedule
+                    team_id = team_assignment[task_id]
+                    if team_id < 0:
+                        # No compatible team
+                        continue
 
-                start_time = max(team_available[team_id], preds_time)
-                assignments.append(Assignment(task_id, team_id, start_time))
+                    start_time = team_available[team_id]
+                    if preds_time > start_time:
+                        start_time = preds_time
+                    assignments.append(Assignment(task_id, team_id, start_time))
 
-                finish = start_time + task.duration
-                scheduled_finishes[task_id] = finish
-                team_available[team_id] = finish
+                    finish = start_time + durations[task_id]
+                    if finish > makespan_limit:
+                        return None
+                    finish_times[task_id] = finish
+                    team_available[team_id] = finish
+                    cost += team_costs[task_id][team_id]
 
-                progress = True
+            recording = False
+            placed = len(assignments) - placed_before
+            placed_before = len(assignments)
 
-            if not progress:
+            if not placed:
                 # Cycle or unresolvable dependencies (e.g. missing preds in list)
                 break
 
+            if placed * 4 < len(next_pending):
+                # Deep dependency chains against the order: re-scanning would
+                # take many more passes, so finish the job with a heap.
+                deferred = decode_deferred(
+                    [task_order[pos] for pos in next_pending],
+                    predecessors,
+                    durations,
+                    team_costs,
+                    team_assignment,
+                    finish_times,
+                    team_available,
+                    assignments,
+                    unscheduled=-1,
+                    makespan_limit=makespan_limit,
+                )
+                if deferred is None:
+                    return None
+                cost += deferred[2]
+                break
+
             pending = next_pending
+            segments = [pending]
+            next_pending = []
+
+        if record:
+            self._checkpoints = checkpoints
+            self._checkpoint_stride = stride
+            self._recorded_assignments = list(assignments)
+            self._recorded_deferred = first_pass_deferred
 
-        return assignments
+        # Unscheduled tasks are -1, so this is the latest scheduled finish
+        makespan = max(finish_times) if assignments else 0
+        return assignments, makespan, cost
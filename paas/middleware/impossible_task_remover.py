@@ -1,7 +1,10 @@
-import sys
+import logging
+from itertools import filterfalse
 from paas.middleware.base import MapProblem
 from paas.models import ProblemInstance, Task
 
+_log = logging.getLogger(__name__)
+
 
 class ImpossibleTaskRemover(MapProblem):
     """
@@ -14,11 +17,10 @@ class ImpossibleTaskRemover(MapProblem):
         self, problem: ProblemInstance, time_limit: float = float("inf")
     ) -> ProblemInstance:
         tasks = problem.tasks
-        to_remove = set()
-
-        for t_id, task in tasks.items():
-            if not task.compatible_teams:
-                to_remove.add(t_id)
+        # Compatibility does not depend on other tasks, so a single scan finds
+        # every impossible task.
+        to_remove = {t_id for t_id, task in tasks.items() if not task.compatible_teams}
+        is_removed = to_remove.__contains__
 
         new_tasks = {}
 
@@ -28,21 +30,21 @@ class ImpossibleTaskRemover(MapProblem):
 
             # Create a new task instance to avoid modifying the original
             # Filter out removed tasks from dependencies
-            new_preds = [p for p in task.predecessors if p not in to_remove]
-            new_succs = [s for s in task.successors if s not in to_remove]
+            new_preds = list(filterfalse(is_removed, task.predecessors))
+            new_succs = list(filterfalse(is_removed, task.successors))
 
             new_task = Task(
                 id=task.id,
                 duration=task.duration,
                 predecessors=new_preds,
                 successors=new_succs,
-                compatible_teams=task.compatible_teams.copy(),
+                compatible_teams=task.compatible_teams,
             )
             new_tasks[t_id] = new_task
 
-        print(
-            f"ImpossibleTaskRemover: Removed {len(to_remove)} tasks (no compatible teams).",
-            file=sys.stderr,
+        _log.info(
+            "ImpossibleTaskRemover: Removed %d tasks (no compatible teams).",
+            len(to_remove),
         )
 
         return ProblemInstance(
@@ -1,6 +1,6 @@
+import heapq
 import random
-import math
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from paas.models import ProblemInstance, Schedule, Assignment
 from paas.middleware.base import MapResult
 from paas.time_budget import TimeBudget
@@ -8,22 +8,14 @@ from paas.time_budget import TimeBudget
 
 class ScheduleResult:
     def __init__(self):
-        self.assignments: List[Assignment] = []
+        # (task_id, team_id, start_time) triples; Assignment objects are only
+        # built for the schedule that is finally returned.
+        self.assignments: List[Tuple[int, int, int]] = []
         self.makespan = 0
         self.total_cost = 0
         self.scheduled_count = 0
 
 
-class Particle:
-    def __init__(self, size: int):
-        self.position = [random.random() for _ in range(size)]
-        self.velocity = [0.0 for _ in range(size)]
-
-        self.best_position = list(self.position)
-        self.best_fitness = float("inf")
-        self.best_result: Optional[ScheduleResult] = None
-
-
 class PSOSearchMiddleware(MapResult):
     """
 
@@ -57,82 +49,100 @@ class PSOSearchMiddleware(MapResult):
 
         self.seed = seed
 
+    def _preprocess(self, problem: ProblemInstance):
+        """
+        Flatten the problem into lists indexed by task / team id once per run,
+        so that the decoder copies and indexes lists instead of dicts.
+        """
+        num_slots = max(problem.tasks, default=0) + 1
+        self.durations: List[int] = [0] * num_slots
+        self.successors: List[List[int]] = [[] for _ in range(num_slots)]
+        self.team_options: List[List[Tuple[int, int]]] = [[] for _ in range(num_slots)]
+        # task -> {team_id: position in team_options[task]}
+        self.team_index: Dict[int, Dict[int, int]] = {}
+        self.initial_in_degree: List[int] = [0] * num_slots
+        for tid, task in problem.tasks.items():
+            self.durations[tid] = task.duration
+            self.successors[tid] = task.successors
+            self.team_options[tid] = list(task.compatible_teams.items())
+            self.team_index[tid] = {
+                team_id: idx for idx, team_id in enumerate(task.compatible_teams)
+            }
+            self.initial_in_degree[tid] = len(task.predecessors)
+
+        self.initial_team_times: List[int] = [0] * (max(problem.teams, default=0) + 1)
+        for tid, team in problem.teams.items():
+            self.initial_team_times[tid] = team.available_from
+        self.root_tasks: List[int] = [
+            tid for tid, task in problem.tasks.items() if not task.predecessors
+        ]
+
     def _decode_particle(
         self, position: List[float], problem: ProblemInstance
     ) -> ScheduleResult:
+        # Position layout: [priorities (N) | team selectors (N)], indexed by
+        # task_id - 1. Requires _preprocess(problem) to have been called.
         N = problem.num_tasks
 
-        priorities = position[:N]
-
-        team_selectors = position[N:]
+        durations = self.durations
+        successors = self.successors
+        team_options = self.team_options
 
-        current_team_times = {
-            tid: team.available_from for tid, team in problem.teams.items()
-        }
-
-        current_in_degree = {
-            tid: len(task.predecessors) for tid, task in problem.tasks.items()
-        }
-
-        valid_start_time_preds = {tid: 0 for tid in problem.tasks}
+        current_team_times = self.initial_team_times[:]
+        current_in_degree = self.initial_in_degree[:]
+        valid_start_time_preds = [0] * len(current_in_degree)
 
         result = ScheduleResult()
-
-        ready_tasks = [tid for tid, deg in current_in_degree.items() if deg == 0]
-
-        while ready_tasks:
-            selected_task_id = max(ready_tasks, key=lambda tid: priorities[tid - 1])
-
-            ready_tasks.remove(selected_task_id)
-
-            task = problem.tasks[selected_task_id]
-
-            options = list(task.compatible_teams.items())
-
+        assignments = result.assignments
+        makespan = 0
+        total_cost = 0
+
+        # Max-heap on priority; ties go to the task that became ready first,
+        # as max() over the ready list in insertion order would pick it.
+        ready_heap = [
+            (-position[tid - 1], seq, tid) for seq, tid in enumerate(self.root_tasks)
+        ]
+        heapq.heapify(ready_heap)
+        seq = len(ready_heap)
+
+        while ready_heap:
+            selected_task_id = heapq.heappop(ready_heap)[2]
+
+            options = team_options[selected_task_id]
             if not options:
                 continue
 
-            selector_value = team_selectors[selected_task_id - 1]
-
+            selector_value = position[N + selected_task_id - 1]
             if selector_value >= 1.0:
                 selector_value = 0.99999
 
-            num_options = len(options)
-
-            choice_index = int(math.floor(selector_value * num_options))
-
-            assigned_team_id, task_cost = options[choice_index]
-
-            start_lim_preds = valid_start_time_preds[selected_task_id]
-
-            start_lim_team = current_team_times[assigned_team_id]
-
-            actual_start_time = max(start_lim_preds, start_lim_team)
+            assigned_team_id, task_cost = options[int(selector_value * len(options))]
 
-            actual_finish_time = actual_start_time + task.duration
+            actual_start_time = valid_start_time_preds[selected_task_id]
+            team_time = current_team_times[assigned_team_id]
+            if team_time > actual_start_time:
+                actual_start_time = team_time
+            actual_finish_time = actual_start_time + durations[selected_task_id]
 
             current_team_times[assigned_team_id] = actual_finish_time
+            assignments.append((selected_task_id, assigned_team_id, actual_start_time))
+            total_cost += task_cost
+            if actual_finish_time > makespan:
+                makespan = actual_finish_time
 
-            result.assignments.append(
-                Assignment(selected_task_id, assigned_team_id, actual_start_time)
-            )
-
-            result.total_cost += task_cost
-
-            result.makespan = max(result.makespan, actual_finish_time)
-
-            result.scheduled_count += 1
-
-            for neighbor_id in task.successors:
+            for neighbor_id in successors[selected_task_id]:
                 current_in_degree[neighbor_id] -= 1
-
-                valid_start_time_preds[neighbor_id] = max(
-                    valid_start_time_preds[neighbor_id], actual_finish_time
-                )
-
+                if actual_finish_time > valid_start_time_preds[neighbor_id]:
+                    valid_start_time_preds[neighbor_id] = actual_finish_time
                 if current_in_degree[neighbor_id] == 0:
-                    ready_tasks.append(neighbor_id)
-
+                    heapq.heappush(
+                        ready_heap, (-position[neighbor_id - 1], seq, neighbor_id)
+                    )
+                    seq += 1
+
+        result.makespan = makespan
+        result.total_cost = total_cost
+        result.scheduled_count = len(assignments)
         return result
 
     def _calculate_fitness(
@@ -152,6 +162,22 @@ class PSOSearchMiddleware(MapResult):
 
         return penalty_unscheduled + score_time + score_cost
 
+    def _evaluate_swarm(
+        self, positions: List[List[float]], problem: ProblemInstance
+    ) -> List[Tuple[float, ScheduleResult]]:
+        """
+        Decode every particle position and return (fitness, result) pairs
+        in swarm order. Decodes are independent of each other and of the
+        bests, so the caller can update the bests afterwards in one sweep.
+        """
+        decode = self._decode_particle
+        calculate_fitness = self._calculate_fitness
+        evaluated = []
+        for position in positions:
+            decode_result = decode(position, problem)
+            evaluated.append((calculate_fitness(decode_result, problem), decode_result))
+        return evaluated
+
     def _encode_schedule(
         self, schedule: Schedule, problem: ProblemInstance
     ) -> List[float]:
@@ -159,55 +185,37 @@ class PSOSearchMiddleware(MapResult):
 
 
         Attempts to encode a schedule into a particle position.
+        Requires _preprocess(problem) to have been called.
 
 
         """
 
         N = problem.num_tasks
 
-        position = [0.5] * (2 * N)
+        # Unscheduled tasks get the lowest priority and a neutral team selector
+        position = [0.0] * N + [0.5] * N
 
         # Priorities based on start time (earlier start = higher priority)
-
         # We want priorities[tid-1] to be large for small start_times
+        max_start = max((a.start_time for a in schedule.assignments), default=0)
 
-        max_start = 0
-
-        assignments_map = {}
-
+        team_index = self.team_index
         for a in schedule.assignments:
-            assignments_map[a.task_id] = a
-
-            max_start = max(max_start, a.start_time)
-
-        for tid in range(1, N + 1):
-            if tid in assignments_map:
-                a = assignments_map[tid]
-
-                # Map [0, max_start] to [1.0, 0.0]
-
-                if max_start > 0:
-                    position[tid - 1] = 1.0 - (a.start_time / max_start)
-
-                else:
-                    position[tid - 1] = 1.0
-
-                # Team selector
-
-                task = problem.tasks[tid]
-
-                options = list(task.compatible_teams.items())
-
-                for idx, (team_id, _) in enumerate(options):
-                    if team_id == a.team_id:
-                        # Map index to range [idx/len, (idx+1)/len]
-
-                        position[N + tid - 1] = (idx + 0.5) / len(options)
-
-                        break
+            tid = a.task_id
+            indices = team_index.get(tid)
+            if indices is None or not 1 <= tid <= N:
+                continue
 
+            # Map [0, max_start] to [1.0, 0.0]
+            if max_start > 0:
+                position[tid - 1] = 1.0 - (a.start_time / max_start)
             else:
-                position[tid - 1] = 0.0  # Low priority if not scheduled
+                position[tid - 1] = 1.0
+
+            # Team selector: map index to range [idx/len, (idx+1)/len]
+            idx = indices.get(a.team_id)
+            if idx is not None:
+                position[N + tid - 1] = (idx + 0.5) / len(indices)
 
         return position
 
@@ -218,16 +226,24 @@ class PSOSearchMiddleware(MapResult):
         time_limit: float = float("inf"),
     ) -> Schedule:
         random.seed(self.seed)
+        self._preprocess(problem)
 
         with TimeBudget(time_limit) as budget:
             dim = 2 * problem.num_tasks
-            swarm = [Particle(dim) for _ in range(self.swarm_size)]
+            rand = random.random
+
+            # Swarm state as parallel per-particle rows. Rows are replaced,
+            # never mutated, so bests can share them instead of copying.
+            positions = [[rand() for _ in range(dim)] for _ in range(self.swarm_size)]
+            velocities = [[0.0] * dim for _ in range(self.swarm_size)]
+            best_positions = list(positions)
+            best_fitness = [float("inf")] * self.swarm_size
 
             # Inject seed into first particle
             if result.assignments:
-                seed_pos = self._encode_schedule(result, problem)
-                swarm[0].position = seed_pos
-                swarm[0].best_position = list(seed_pos)
+                positions[0] = best_positions[0] = self._encode_schedule(
+                    result, problem
+                )
 
             global_best_fitness = float("inf")
             global_best_result: Optional[ScheduleResult] = None
@@ -237,52 +253,58 @@ class PSOSearchMiddleware(MapResult):
                 if budget.is_expired():
                     break
 
-                for particle in swarm:
-                    decode_result = self._decode_particle(particle.position, problem)
-                    fitness = self._calculate_fitness(decode_result, problem)
-
-                    if fitness < particle.best_fitness:
-                        particle.best_fitness = fitness
-                        particle.best_position = list(particle.position)
-                        particle.best_result = decode_result
+                for k, (fitness, decode_result) in enumerate(
+                    self._evaluate_swarm(positions, problem)
+                ):
+                    if fitness < best_fitness[k]:
+                        best_fitness[k] = fitness
+                        best_positions[k] = positions[k]
 
                     if fitness < global_best_fitness:
                         global_best_fitness = fitness
-                        global_best_position = list(particle.position)
+                        global_best_position = positions[k]
                         global_best_result = decode_result
 
                 if global_best_position is None:
                     continue
 
-                for particle in swarm:
-                    for i in range(dim):
-                        r1 = random.random()
-                        r2 = random.random()
-
-                        vel_cognitive = (
-                            self.c1
-                            * r1
-                            * (particle.best_position[i] - particle.position[i])
-                        )
-                        vel_social = (
-                            self.c2
-                            * r2
-                            * (global_best_position[i] - particle.position[i])
+                w, c1, c2 = self.w, self.c1, self.c2
+                for k, position in enumerate(positions):
+                    # Rebuild the rows in a single zipped pass; the arithmetic
+                    # and random draw order match the scalar update.
+                    new_position = []
+                    new_velocity = []
+                    for x, v, p_best, g_best in zip(
+                        position,
+                        velocities[k],
+                        best_positions[k],
+                        global_best_position,
+                    ):
+                        v = (
+                            w * v
+                            + c1 * rand() * (p_best - x)
+                            + c2 * rand() * (g_best - x)
                         )
+                        x += v
 
-                        particle.velocity[i] = (
-                            (self.w * particle.velocity[i]) + vel_cognitive + vel_social
-                        )
-                        particle.position[i] += particle.velocity[i]
+                        if x < 0.0:
+                            x = 0.0
+                            v *= -0.5
+                        elif x > 1.0:
+                            x = 1.0
+                            v *= -0.5
+
+                        new_position.append(x)
+                        new_velocity.append(v)
 
-                        if particle.position[i] < 0.0:
-                            particle.position[i] = 0.0
-                            particle.velocity[i] *= -0.5
-                        elif particle.position[i] > 1.0:
-                            particle.position[i] = 1.0
-                            particle.velocity[i] *= -0.5
+                    positions[k] = new_position
+                    velocities[k] = new_velocity
 
             if global_best_result:
                 # If seed was better, it might still win via global_best if decode is exact or close
-                return Schedule(assignments=global_best_result.assignments)
+                return Schedule(
+                    assignments=[
+                        Assignment(*triple) for triple in global_best_result.assignments
+                    ]
+                )
             return result
@@ -1,10 +1,14 @@
+import concurrent.futures
 import math
 import random
 import sys
-from typing import List, Dict, Tuple
+import time
+from itertools import repeat
+from typing import List, Optional, Tuple
 
 from paas.middleware.base import MapResult
-from paas.models import ProblemInstance, Schedule, Assignment
+from paas.middleware.decoding import decode_deferred
+from paas.models import Assignment, CompiledProblem, ProblemInstance, Schedule
 from paas.time_budget import TimeBudget
 
 
@@ -25,10 +29,35 @@ class SimulatedAnnealingRefiner(MapResult):
         initial_temp: float = 1000.0,
         seed: int = 42,
         time_factor: float = 1.0,
+        num_chains: int = 1,
+        restart_evals: int = 1000,
     ):
         super().__init__(time_factor)
         self.initial_temp = initial_temp
         self.seed = seed
+        # Independent chains run in separate processes (seeds seed, seed+1, ...)
+        self.num_chains = num_chains
+        # Without a time limit, restart r cools linearly over
+        # restart_evals * 2**r evaluations (Variable Annealing Length)
+        self.restart_evals = restart_evals
+        # Per-chain generator, re-seeded by `_run_chain`
+        self._rng = random.Random(seed)
+
+        # Preprocessed data, indexed by task / team id
+        self.durations: List[int] = []
+        self.predecessors: List[List[int]] = []
+        self.team_costs: List[List[int]] = []
+        self.team_initial_availability: List[int] = []
+        self.compatible_teams: List[List[int]] = []
+
+        # First-pass checkpoints of the current state (see `_decode`), and
+        # the recording of the last decode, adopted by `_commit_decode`
+        self._checkpoints: List[
+            Tuple[int, int, int, int, int, List[Optional[int]], List[int]]
+        ] = []
+        self._checkpoint_stride = 1
+        self._recorded_deferred: List[int] = []
+        self._last_recording: Tuple = (0, [], [], 1)
 
     def map_result(
         self,
@@ -45,24 +74,94 @@ class SimulatedAnnealingRefiner(MapResult):
         if not problem.tasks:
             return result
 
-        random.seed(self.seed)
+        self._preprocess(problem)
+
+        if self.num_chains > 1:
+            # Taken before the pool starts, so that the process startup and
+            # the transfer of the problem count against time_limit
+            deadline = time.time() + time_limit
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.num_chains
+            ) as executor:
+                chains = list(
+                    executor.map(
+                        self._run_chain_until,
+                        repeat(problem),
+                        repeat(result),
+                        [self.seed + i for i in range(self.num_chains)],
+                        repeat(deadline),
+                    )
+                )
+        else:
+            chains = [self._run_chain(problem, result, self.seed, time_limit)]
+
+        # The chain with the best fitness wins (ties go to the lower seed)
+        _, best_order, best_teams = min(chains, key=lambda chain: chain[0])
+
+        # 7. Decode best state back to Schedule
+        final_assignments, _ = self._evaluate(problem, best_order, best_teams)
+        return Schedule(assignments=final_assignments)
+
+    def _preprocess(self, problem: ProblemInstance):
+        """
+        Flatten the problem into lists indexed by task / team id once per
+        run, so that decoding indexes lists instead of hashing into dicts.
+        """
+        compiled = CompiledProblem.from_problem(problem)
+        self.durations = compiled.durations
+        self.predecessors = compiled.predecessors
+        self.team_costs = compiled.team_costs
+        self.team_initial_availability = compiled.team_available_from
+        self.compatible_teams = compiled.compatible_teams
+
+    def _run_chain_until(
+        self,
+        problem: ProblemInstance,
+        result: Schedule,
+        seed: int,
+        deadline: float,
+    ) -> Tuple[Tuple[int, int, int], List[int], List[int]]:
+        """
+        Run one annealing chain with whatever time is left before 'deadline',
+        an absolute `time.time()` value (inf for no limit).
+        """
+        time_limit = max(0.0, deadline - time.time())
+        return self._run_chain(problem, result, seed, time_limit)
+
+    def _run_chain(
+        self,
+        problem: ProblemInstance,
+        result: Schedule,
+        seed: int,
+        time_limit: float,
+    ) -> Tuple[Tuple[int, int, int], List[int], List[int]]:
+        """
+        Run one annealing chain from 'result'.
+        Returns (best_fitness, best_order, best_teams).
+        """
+        self._rng = rng = random.Random(seed)
+        self._checkpoints = []
 
         # 1. Lift Schedule -> Internal State (Genotype)
         current_order, current_teams = self._schedule_to_state(problem, result)
 
-        # 2. Initialize Energy
-        current_assignments, current_fitness = self._evaluate(
-            problem, current_order, current_teams
-        )
-        current_energy = self._calculate_energy(current_fitness)
+        # Mutations pick from the tasks that have a team, which never change
+        team_task_ids = [tid for tid in current_order if current_teams[tid] >= 0]
+
+        # 2. Initialize Fitness
+        current_fitness = self._evaluate_fitness(problem, current_order, current_teams)
+        self._commit_decode()
 
         best_order = list(current_order)
-        best_teams = dict(current_teams)
-        best_energy = current_energy
+        best_teams = list(current_teams)
+        best_fitness = current_fitness
 
         temperature = self.initial_temp
 
         use_time_limit = time_limit != float("inf")
+        restart = 0
+        max_evals = self.restart_evals
+        evals = 0
 
         with TimeBudget.from_seconds(time_limit) as budget:
             while True:
@@ -77,53 +176,68 @@ class SimulatedAnnealingRefiner(MapResult):
                     # Ensure remaining is non-negative and <= time_limit
                     ratio = max(0.0, min(1.0, remaining / time_limit))
                     temperature = self.initial_temp * ratio
-
-                # If infinite time, we technically run forever at initial_temp
-                # (or until externally killed, though this loop won't check external signals explicitly)
-
-                # 3. Create Neighbor (Mutation)
-                neighbor_order, neighbor_teams = self._mutate(
-                    problem, current_order, current_teams
+                else:
+                    # No time to cool against: run ever longer cooling
+                    # schedules, each restarting from the best state so far.
+                    # Still runs until externally killed.
+                    if evals >= max_evals:
+                        restart += 1
+                        max_evals = self.restart_evals * 2**restart
+                        evals = 0
+                        current_order = list(best_order)
+                        current_teams = list(best_teams)
+                        current_fitness = best_fitness
+                        self._evaluate_fitness(problem, current_order, current_teams)
+                        self._commit_decode()
+                    temperature = self.initial_temp * (1.0 - evals / max_evals)
+                    evals += 1
+
+                # 3. Move to a Neighbor (Mutation), undone unless accepted
+                move, changed_from = self._mutate(
+                    problem, current_order, current_teams, team_task_ids
                 )
 
-                # 4. Evaluate Neighbor
-                _, neighbor_fitness = self._evaluate(
-                    problem, neighbor_order, neighbor_teams
+                # 4. Evaluate Neighbor, reusing the unchanged prefix
+                neighbor_fitness = self._evaluate_fitness(
+                    problem, current_order, current_teams, start=changed_from
                 )
-                neighbor_energy = self._calculate_energy(neighbor_fitness)
 
                 # 5. Acceptance Criteria (Metropolis)
-                delta_e = neighbor_energy - current_energy
                 accept = False
 
-                if delta_e < 0:
+                if neighbor_fitness < current_fitness:
                     # Strictly better
                     accept = True
                 elif temperature > 1e-10:
-                    # Worse, but accept with probability
-                    if random.random() < math.exp(-delta_e / temperature):
+                    # Worse, but accept with probability exp(-delta_e / T).
+                    delta_e = self._energy_delta(neighbor_fitness, current_fitness)
+                    # Past exp(-20) < 3e-9 the exp() call is not worth it; the
+                    # draw is still made so the random stream is unaffected.
+                    scaled_delta = delta_e / temperature
+                    draw = rng.random()
+                    if scaled_delta < 20.0 and draw < math.exp(-scaled_delta):
                         accept = True
 
-                if accept:
-                    current_order = neighbor_order
-                    current_teams = neighbor_teams
-                    current_energy = neighbor_energy
+                if not accept:
+                    self._undo_mutation(current_order, current_teams, move)
+                else:
+                    current_fitness = neighbor_fitness
+                    self._commit_decode()
 
                     # Keep track of absolute best
-                    if current_energy < best_energy:
+                    if current_fitness < best_fitness:
                         best_order = list(current_order)
-                        best_teams = dict(current_teams)
-                        best_energy = current_energy
+                        best_teams = list(current_teams)
+                        best_fitness = current_fitness
 
-        # 7. Decode best state back to Schedule
-        final_assignments, _ = self._evaluate(problem, best_order, best_teams)
-        return Schedule(assignments=final_assignments)
+        return best_fitness, best_order, best_teams
 
     def _schedule_to_state(
         self, problem: ProblemInstance, schedule: Schedule
-    ) -> Tuple[List[int], Dict[int, int]]:
+    ) -> Tuple[List[int], List[int]]:
         """
-        Converts a Schedule object into the internal Order and Team Map.
+        Converts a Schedule object into the internal Order and Team Map, the
+        team of each task id (-1 for tasks without one).
         It ensures ALL tasks in the problem are included in the state, even if
         they weren't scheduled in the input (so SA can try to fit them in).
         """
@@ -131,7 +245,9 @@ class SimulatedAnnealingRefiner(MapResult):
         sorted_assignments = sorted(schedule.assignments, key=lambda a: a.start_time)
 
         task_order = [a.task_id for a in sorted_assignments]
-        team_assignment = {a.task_id: a.team_id for a in sorted_assignments}
+        team_assignment = [-1] * len(self.durations)
+        for a in sorted_assignments:
+            team_assignment[a.task_id] = a.team_id
 
         # Identify missing tasks (unscheduled ones)
         scheduled_ids = set(task_order)
@@ -141,143 +257,295 @@ class SimulatedAnnealingRefiner(MapResult):
         missing_ids = list(all_task_ids - scheduled_ids)
 
         # Append missing tasks to the end (randomly shuffled)
-        random.shuffle(missing_ids)
+        self._rng.shuffle(missing_ids)
         task_order.extend(missing_ids)
 
         # Assign valid random teams to the missing tasks
         for tid in missing_ids:
-            compat = list(problem.tasks[tid].compatible_teams.keys())
+            compat = self.compatible_teams[tid]
             if compat:
-                team_assignment[tid] = random.choice(compat)
+                team_assignment[tid] = self._rng.choice(compat)
 
         return task_order, team_assignment
 
     def _mutate(
-        self, problem: ProblemInstance, order: List[int], teams: Dict[int, int]
-    ) -> Tuple[List[int], Dict[int, int]]:
+        self,
+        problem: ProblemInstance,
+        order: List[int],
+        teams: List[int],
+        team_task_ids: List[int],
+    ) -> Tuple[Optional[Tuple[str, int, int]], int]:
         """
-        Generates a neighbor by modifying order OR teams.
-        Returns NEW copies of list/dict to avoid side effects.
+        Moves the state to a neighbor by modifying order OR teams, in place.
+        'team_task_ids' lists the tasks that have a team in 'teams'.
+        Returns the move, for `_undo_mutation` (None if nothing changed), and
+        the first position of the order whose decoding may differ.
         """
-        new_order = list(order)
-        new_teams = dict(teams)
+        rng = self._rng
 
         # 50% chance to swap order, 50% chance to change a team
-        if random.random() < 0.5 and len(new_order) >= 2:
+        if rng.random() < 0.5 and len(order) >= 2:
             # Swap Mutation
-            i, j = random.sample(range(len(new_order)), 2)
-            new_order[i], new_order[j] = new_order[j], new_order[i]
+            # Two distinct positions without materializing a sample list
+            i = rng.randrange(len(order))
+            j = rng.randrange(len(order) - 1)
+            if j >= i:
+                j += 1
+            order[i], order[j] = order[j], order[i]
+            return ("swap", i, j), min(i, j)
         else:
             # Team Mutation
             # Pick a random task that has choices
-            tid = random.choice(list(new_teams.keys()))
-            compat = list(problem.tasks[tid].compatible_teams.keys())
+            tid = rng.choice(team_task_ids)
+            compat = self.compatible_teams[tid]
             if len(compat) > 1:
                 # Pick a different team
-                current_team = new_teams[tid]
+                current_team = teams[tid]
                 choices = [t for t in compat if t != current_team]
                 if choices:
-                    new_teams[tid] = random.choice(choices)
+                    teams[tid] = rng.choice(choices)
+                    # The team of tid is not read before its position
+                    return ("team", tid, current_team), order.index(tid)
 
-        return new_order, new_teams
+        return None, len(order)
 
-    def _calculate_energy(self, fitness: Tuple[int, int, int]) -> float:
+    def _undo_mutation(
+        self,
+        order: List[int],
+        teams: List[int],
+        move: Optional[Tuple[str, int, int]],
+    ):
         """
-        Collapses (-task_count, makespan, cost) into a single scalar.
-        Lower is better.
+        Reverts a move made by `_mutate`.
+        """
+        if move is None:
+            return
+        kind, a, b = move
+        if kind == "swap":
+            order[a], order[b] = order[b], order[a]
+        else:
+            teams[a] = b
+
+    def _energy_delta(
+        self, fitness: Tuple[int, int, int], reference: Tuple[int, int, int]
+    ) -> float:
+        """
+        Energy of (-task_count, makespan, cost) 'fitness' relative to
+        'reference', for the Metropolis rule. States are ranked by comparing
+        fitness tuples directly; this scalar only sizes a worsening.
         """
-        neg_count, makespan, cost = fitness
         # Hierarchy:
         # 1. Maximize Task Count (Minimize neg_count) - Weight 10^12
         # 2. Minimize Makespan - Weight 10^6
         # 3. Minimize Cost - Weight 1
-        return (neg_count * 1e12) + (makespan * 1e6) + cost
+        # The integer differences are exact; only their weighted sum is a float.
+        return (
+            (fitness[0] - reference[0]) * 1e12
+            + (fitness[1] - reference[1]) * 1e6
+            + (fitness[2] - reference[2])
+        )
 
     def _evaluate(
         self,
         problem: ProblemInstance,
         task_order: List[int],
-        team_assignment: Dict[int, int],
+        team_assignment: List[int],
     ) -> Tuple[List[Assignment], Tuple[int, int, int]]:
         """
         Decodes the state into a schedule and calculates fitness.
         Returns (assignments, (neg_count, makespan, cost))
         """
-        assignments = self._decode(problem, task_order, team_assignment)
+        assignments: List[Assignment] = []
+        num_assigned, makespan, total_cost = self._decode(
+            problem, task_order, team_assignment, assignments=assignments
+        )
 
-        if not assignments:
+        if not num_assigned:
             return [], (0, sys.maxsize, sys.maxsize)
 
-        count = len(assignments)
-        makespan = 0
-        total_cost = 0
+        return assignments, (-num_assigned, makespan, total_cost)
 
-        for a in assignments:
-            task = problem.tasks[a.task_id]
-            finish = a.start_time + task.duration
-            makespan = max(makespan, finish)
-            total_cost += task.compatible_teams.get(a.team_id, 10**12)
+    def _evaluate_fitness(
+        self,
+        problem: ProblemInstance,
+        task_order: List[int],
+        team_assignment: List[int],
+        start: int = 0,
+    ) -> Tuple[int, int, int]:
+        """
+        The fitness `_evaluate` would return, without building the schedule.
+        Used for every state the chain visits.
+        """
+        num_assigned, makespan, total_cost = self._decode(
+            problem, task_order, team_assignment, start=start
+        )
+
+        if not num_assigned:
+            return (0, sys.maxsize, sys.maxsize)
+
+        return (-num_assigned, makespan, total_cost)
 
-        return assignments, (-count, makespan, total_cost)
+    def _commit_decode(self):
+        """
+        Make the state of the last `_decode` the current one, whose first-pass
+        checkpoints later decodes resume from.
+        """
+        first, checkpoints, deferred, stride = self._last_recording
+        self._checkpoints = self._checkpoints[:first] + checkpoints
+        self._recorded_deferred = deferred
+        self._checkpoint_stride = stride
 
     def _decode(
         self,
         problem: ProblemInstance,
         task_order: List[int],
-        team_assignment: Dict[int, int],
-    ) -> List[Assignment]:
+        team_assignment: List[int],
+        start: int = 0,
+        assignments: Optional[List[Assignment]] = None,
+    ) -> Tuple[int, int, int]:
         """
         Serial Schedule Generation Scheme (SGS).
         Greedily schedules tasks in 'task_order' as early as dependencies
         and team availability allow.
+        Returns (number of scheduled tasks, makespan, cost), accumulated
+        while scheduling. The schedule itself is only built when an
+        'assignments' list to append to is given.
+        Requires _preprocess(problem) to have been called.
+
+        The first pass is checkpointed every `_checkpoint_stride` positions.
+        If the state only differs from the committed one (see
+        `_commit_decode`) at positions >= `start`, the first pass resumes
+        from the closest committed checkpoint instead of position 0.
         """
-        scheduled_finishes: Dict[int, int] = {}
-        assignments: List[Assignment] = []
+        stride = max(1, int(len(task_order) ** 0.5))
+        if assignments is not None:
+            # Checkpoints do not keep the assignments of the prefix
+            start = 0
+
+        if self._checkpoints and stride == self._checkpoint_stride:
+            first = min(start // stride, len(self._checkpoints) - 1)
+            checkpoint = self._checkpoints[first]
+            pos, num_assigned, num_deferred, makespan, total_cost = checkpoint[:5]
+            scheduled_finishes = checkpoint[5][:]
+            team_available = checkpoint[6][:]
+            next_pending = self._recorded_deferred[:num_deferred]
+        else:
+            first = 0
+            pos = 0
+            num_assigned = 0
+            makespan = 0
+            total_cost = 0
+            # Finish time per task id, None while unscheduled
+            scheduled_finishes: List[Optional[int]] = [None] * len(self.durations)
+            team_available = self.team_initial_availability[:]
+            next_pending = []
 
-        team_available = {
-            tid: team.available_from for tid, team in problem.teams.items()
-        }
+        checkpoints = []
+        first_pass_deferred = next_pending
+        durations = self.durations
+        predecessors = self.predecessors
+        team_costs = self.team_costs
 
         # We need to iterate multiple times if strict order is invalid,
         # but SGS usually just skips unready tasks and retries them.
-        pending = list(task_order)
+        # The first pass runs in stride-long segments with a checkpoint
+        # before each one.
+        pending = task_order
+        segments = [
+            range(seg_start, min(seg_start + stride, len(task_order)))
+            for seg_start in range(pos, len(task_order), stride)
+        ]
+        recording = True
+        placed_before = 0
 
         while pending:
-            progress = False
-            next_pending = []
-
-            for task_id in pending:
-                # 1. Check Predecessors
-                task = problem.tasks[task_id]
-                preds_ready = True
-                preds_finish_time = 0
-
-                for p in task.predecessors:
-                    if p not in scheduled_finishes:
-                        preds_ready = False
-                        break
-                    preds_finish_time = max(preds_finish_time, scheduled_finishes[p])
-
-                if not preds_ready:
-                    next_pending.append(task_id)
-                    continue
-
-                # 2. Schedule
-                team_id = team_assignment[task_id]
-                start_time = max(team_available[team_id], preds_finish_time)
-
-                assignments.append(Assignment(task_id, team_id, start_time))
-
-                finish_time = start_time + task.duration
-                scheduled_finishes[task_id] = finish_time
-                team_available[team_id] = finish_time
-
-                progress = True
-
-            if not progress:
+            for segment in segments:
+                if recording:
+                    checkpoints.append(
+                        (
+                            segment.start,
+                            num_assigned,
+                            len(next_pending),
+                            makespan,
+                            total_cost,
+                            scheduled_finishes[:],
+                            team_available[:],
+                        )
+                    )
+
+                for task_id in map(pending.__getitem__, segment):
+                    # 1. Check Predecessors
+                    preds_ready = True
+                    preds_finish_time = 0
+
+                    for p in predecessors[task_id]:
+                        finish = scheduled_finishes[p]
+                        if finish is None:
+                            preds_ready = False
+                            break
+                        if finish > preds_finish_time:
+                            preds_finish_time = finish
+
+                    if not preds_ready:
+                        next_pending.append(task_id)
+                        continue
+
+                    # 2. Schedule
+                    team_id = team_assignment[task_id]
+                    start_time = max(team_available[team_id], preds_finish_time)
+
+                    num_assigned += 1
+                    if assignments is not None:
+                        assignments.append(Assignment(task_id, team_id, start_time))
+
+                    finish_time = start_time + durations[task_id]
+                    scheduled_finishes[task_id] = finish_time
+                    team_available[team_id] = finish_time
+                    if finish_time > makespan:
+                        makespan = finish_time
+                    total_cost += team_costs[task_id][team_id]
+
+            if recording:
+                self._last_recording = (
+                    first,
+                    checkpoints,
+                    first_pass_deferred,
+                    stride,
+                )
+                recording = False
+                # Passes count from the start of the order, resumed or not
+                placed = num_assigned
+            else:
+                placed = num_assigned - placed_before
+            placed_before = num_assigned
+
+            if not placed:
                 # Either all remaining tasks are cyclic or impossible
                 break
 
+            if placed * 4 < len(next_pending):
+                # Long dependency chains against the order: re-scanning would
+                # take about one pass per link, so finish with a heap instead.
+                deferred = decode_deferred(
+                    next_pending,
+                    self.predecessors,
+                    self.durations,
+                    team_costs,
+                    team_assignment,
+                    scheduled_finishes,
+                    team_available,
+                    assignments,
+                )
+                # Only a makespan limit can abort the deferred decode
+                assert deferred is not None
+                deferred_placed, deferred_makespan, deferred_cost = deferred
+                num_assigned += deferred_placed
+                makespan = max(makespan, deferred_makespan)
+                total_cost += deferred_cost
+                break
+
             pending = next_pending
+            segments = [range(len(pending))]
+            next_pending = []
 
-        return assignments
+        return num_assigned, makespan, total_cost
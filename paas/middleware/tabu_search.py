@@ -1,35 +1,29 @@
-import sys
+import bisect
+import math
 import random
 import heapq
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Tuple, Optional, Dict
-from paas.models import ProblemInstance, Schedule, Assignment
+from typing import List, Tuple, Optional
+from paas.models import (
+    DATACLASS_SLOTS,
+    Assignment,
+    CompiledProblem,
+    ProblemInstance,
+    Schedule,
+)
 from paas.middleware.base import MapResult
 from paas.time_budget import TimeBudget
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Solution:
     task_order: List[int]
     team_assignment: List[int]
     fitness: Optional[Tuple[int, int, int]] = None
-
-
-@dataclass
-class Move:
-    move_type: str
-    task_id_1: int
-    task_id_2: int = -1
-
-    def __hash__(self):
-        return hash((self.move_type, self.task_id_1, self.task_id_2))
-
-    def __eq__(self, other):
-        return (self.move_type, self.task_id_1, self.task_id_2) == (
-            other.move_type,
-            other.task_id_1,
-            other.task_id_2,
-        )
+    # Hash of (task_order, team_assignment), see `_state_key`
+    key: Optional[int] = None
 
 
 class TabuSearchMiddleware(MapResult):
@@ -44,11 +38,19 @@ class TabuSearchMiddleware(MapResult):
         max_neighbors: int = 500,
         seed: int = 42,
         time_factor: float = 1.0,
+        fitness_cache_size: int = 50000,
+        first_improvement: bool = False,
     ):
         super().__init__(time_factor)
         self.tabu_tenure = tabu_tenure
         self.max_neighbors = max_neighbors
         self.seed = seed
+        self.fitness_cache_size = fitness_cache_size
+        # Move to the first admissible neighbor that beats the current
+        # solution instead of scanning the whole neighborhood
+        self.first_improvement = first_improvement
+        # Generator for the search itself, re-seeded by `map_result`
+        self._rng = random.Random(seed)
 
         self.num_tasks: int = 0
         self.num_teams: int = 0
@@ -60,38 +62,79 @@ class TabuSearchMiddleware(MapResult):
         self.team_costs: List[List[int]] = []
         self.team_initial_availability: List[int] = []
         self.tasks_with_teams: List[int] = []
+        # Tasks with alternative teams, and the index of each one's first
+        # reassignment among all of them (see `_get_neighbors`)
+        self.reassign_tasks: List[int] = []
+        self.reassign_offsets: List[int] = []
+        self.num_reassignments: int = 0
+        # Size of the tabu table: one slot per unordered task pair, then one
+        # per (task, team) pair (see `_move_slot`)
+        self.num_swap_slots: int = 0
+        self.num_tabu_slots: int = 0
+
+        # Random 64-bit weights for the state hash (see `_state_key`)
+        self.task_keys: List[int] = []
+        self.position_keys: List[int] = []
+        self.team_keys: List[int] = []
+        # LRU of state hash -> fitness. Hits are trusted without comparing
+        # the states: checking would mean keeping a copy of every cached
+        # state, and two of at most fitness_cache_size (5e4) random 64-bit
+        # keys collide with odds of about 1e-10 per run. A collision would
+        # give a neighbor the fitness of another state.
+        self._fitness_cache: OrderedDict[int, Tuple[int, int, int]] = OrderedDict()
 
     def _preprocess(self, problem: ProblemInstance):
         problem.assert_continuous_indices()
         self.num_tasks = problem.num_tasks
         self.num_teams = problem.num_teams
 
-        self.team_initial_availability = [0] * self.num_teams
-        for tid, team in problem.teams.items():
-            self.team_initial_availability[tid] = team.available_from
-
-        self.durations = [0] * self.num_tasks
-        self.predecessors = [[] for _ in range(self.num_tasks)]
-        self.successors = [[] for _ in range(self.num_tasks)]
-        self.initial_in_degrees = [0] * self.num_tasks
-        self.compatible_teams_indices = [[] for _ in range(self.num_tasks)]
-
-        INF = 10**12
-        self.team_costs = [[INF] * self.num_teams for _ in range(self.num_tasks)]
-        self.tasks_with_teams = []
-
-        for tid, task in problem.tasks.items():
-            self.durations[tid] = task.duration
-            self.predecessors[tid] = task.predecessors
-            self.successors[tid] = task.successors
-            self.initial_in_degrees[tid] = len(task.predecessors)
-
-            if task.compatible_teams:
-                self.tasks_with_teams.append(tid)
-
-            for team_idx, cost in task.compatible_teams.items():
-                self.compatible_teams_indices[tid].append(team_idx)
-                self.team_costs[tid][team_idx] = cost
+        compiled = CompiledProblem.from_problem(problem)
+        self.team_initial_availability = compiled.team_available_from
+
+        self.durations = compiled.durations
+        self.predecessors = compiled.predecessors
+        self.successors = compiled.successors
+        self.initial_in_degrees = compiled.in_degrees
+        self.compatible_teams_indices = compiled.compatible_teams
+        self.team_costs = compiled.team_costs
+        self.tasks_with_teams = compiled.tasks_with_teams
+
+        # Each task can move to any of its other compatible teams
+        self.reassign_tasks = []
+        self.reassign_offsets = []
+        self.num_reassignments = 0
+        for tid in self.tasks_with_teams:
+            num_opts = len(self.compatible_teams_indices[tid])
+            if num_opts > 1:
+                self.reassign_tasks.append(tid)
+                self.reassign_offsets.append(self.num_reassignments)
+                self.num_reassignments += num_opts - 1
+
+        self.num_swap_slots = self.num_tasks * (self.num_tasks - 1) // 2
+        self.num_tabu_slots = self.num_swap_slots + self.num_tasks * self.num_teams
+
+        # A private generator, so hashing does not shift the seeded search
+        rng = random.Random(self.seed)
+        self.task_keys = [rng.getrandbits(64) for _ in range(self.num_tasks)]
+        self.position_keys = [rng.getrandbits(64) for _ in range(self.num_tasks)]
+        self.team_keys = [rng.getrandbits(64) for _ in range(self.num_teams)]
+        self._fitness_cache = OrderedDict()
+
+    def _state_key(self, solution: Solution) -> int:
+        """
+        Hash a state as sum(task_key[t] * position_key[pos]) over the order
+        plus sum(task_key[t] * team_key[team]) over the tasks, mod 2**64.
+
+        Both sums are linear, so a neighbor's key follows from its parent's
+        in O(1) (see `_get_neighbors`) instead of hashing both lists.
+        """
+        task_keys = self.task_keys
+        key = 0
+        for pos, tid in enumerate(solution.task_order):
+            key += task_keys[tid] * self.position_keys[pos]
+        for tid in self.tasks_with_teams:
+            key += task_keys[tid] * self.team_keys[solution.team_assignment[tid]]
+        return key & 0xFFFFFFFFFFFFFFFF
 
     def _schedule_to_solution(self, schedule: Schedule) -> Solution:
         team_assignment = [0] * self.num_tasks
@@ -101,7 +144,7 @@ class TabuSearchMiddleware(MapResult):
 
         scheduled_ids = set(task_order)
         remaining = [tid for tid in self.tasks_with_teams if tid not in scheduled_ids]
-        random.shuffle(remaining)
+        self._rng.shuffle(remaining)
         task_order.extend(remaining)
 
         for a in schedule.assignments:
@@ -110,11 +153,14 @@ class TabuSearchMiddleware(MapResult):
         for tid in remaining:
             opts = self.compatible_teams_indices[tid]
             if opts:
-                team_assignment[tid] = random.choice(opts)
+                team_assignment[tid] = self._rng.choice(opts)
 
         return Solution(task_order=task_order, team_assignment=team_assignment)
 
-    def _decode(self, solution: Solution) -> List[Assignment]:
+    def _decode(self, solution: Solution) -> Tuple[List[Assignment], int, int]:
+        """
+        Returns (assignments, makespan, cost).
+        """
         priority = [0] * self.num_tasks
         for rank, tid in enumerate(solution.task_order):
             priority[tid] = rank
@@ -122,6 +168,9 @@ class TabuSearchMiddleware(MapResult):
         team_available = list(self.team_initial_availability)
         task_finish_times = [-1] * self.num_tasks
         current_in_degrees = list(self.initial_in_degrees)
+        team_costs = self.team_costs
+        makespan = 0
+        cost = 0
 
         assignments: List[Assignment] = []
         ready_heap = []
@@ -145,6 +194,9 @@ class TabuSearchMiddleware(MapResult):
 
             task_finish_times[task_id] = finish_time
             team_available[team_idx] = finish_time
+            if finish_time > makespan:
+                makespan = finish_time
+            cost += team_costs[task_id][team_idx]
 
             assignments.append(Assignment(task_id, team_idx, start_time))
 
@@ -154,91 +206,133 @@ class TabuSearchMiddleware(MapResult):
                     if self.compatible_teams_indices[s]:
                         heapq.heappush(ready_heap, (priority[s], s))
 
-        return assignments
+        return assignments, makespan, cost
 
     def _evaluate(self, solution: Solution) -> Tuple[int, int, int]:
         if solution.fitness is not None:
             return solution.fitness
 
-        assignments = self._decode(solution)
-
-        if not assignments:
-            return (0, sys.maxsize, sys.maxsize)
-
-        task_count = len(assignments)
-        completion_time = 0
-        total_cost = 0
-
-        for a in assignments:
-            duration = self.durations[a.task_id]
-            finish = a.start_time + duration
-            if finish > completion_time:
-                completion_time = finish
-            total_cost += self.team_costs[a.task_id][a.team_id]
-
-        solution.fitness = (-task_count, completion_time, total_cost)
+        if solution.key is None:
+            solution.key = self._state_key(solution)
+        cache = self._fitness_cache
+        fitness = cache.get(solution.key)
+        if fitness is not None:
+            cache.move_to_end(solution.key)
+            solution.fitness = fitness
+            return fitness
+
+        assignments, makespan, cost = self._decode(solution)
+        solution.fitness = (-len(assignments), makespan, cost)
+        cache[solution.key] = solution.fitness
+        if len(cache) > self.fitness_cache_size:
+            cache.popitem(last=False)
         return solution.fitness
 
+    @staticmethod
+    def _swap_pair(n: int, m: int) -> Tuple[int, int]:
+        """
+        The m-th pair (i, j), i < j < n, in row-major order.
+        """
+        # Counted from the end, row i holds the r + 1 pairs after the first
+        # r * (r + 1) / 2, where r = n - 2 - i
+        k = n * (n - 1) // 2 - 1 - m
+        r = (math.isqrt(8 * k + 1) - 1) // 2
+        i = n - 2 - r
+        j = m - i * (2 * n - i - 1) // 2 + i + 1
+        return i, j
+
+    def _swap_slot(self, a: int, b: int) -> int:
+        """
+        Tabu table slot of swapping tasks a and b, in either order.
+        """
+        if a > b:
+            a, b = b, a
+        return a * (2 * self.num_tasks - a - 1) // 2 + b - a - 1
+
+    def _team_slot(self, tid: int, team_idx: int) -> int:
+        """
+        Tabu table slot of moving task tid to team team_idx.
+        """
+        return self.num_swap_slots + tid * self.num_teams + team_idx
+
     def _get_neighbors(
         self,
         current: Solution,
-        tabu_list: Dict[Move, int],
+        tabu_expiry: "array[int]",
         current_iter: int,
-    ) -> List[Tuple[Solution, Move]]:
+    ) -> List[Tuple[Solution, int]]:
+        """
+        Sample swap and team-change neighbors of `current`, each paired with
+        its move's slot in the tabu table.
+        """
         neighbors = []
         task_order = current.task_order
         n = len(task_order)
 
-        swap_candidates = []
-        for i in range(n):
-            for j in range(i + 1, n):
-                swap_candidates.append((i, j))
-
-        if len(swap_candidates) > self.max_neighbors // 2:
-            swap_candidates = random.sample(swap_candidates, self.max_neighbors // 2)
-
-        for i, j in swap_candidates:
+        if current.key is None:
+            current.key = self._state_key(current)
+        task_keys = self.task_keys
+        position_keys = self.position_keys
+        team_keys = self.team_keys
+
+        # Candidates are numbered instead of listed: the pairs i < j in
+        # row-major order for swaps, and the (task, other team) pairs in task
+        # order for reassignments. Sampling a range draws the same indices
+        # as sampling the full list would, without building O(n^2) tuples.
+        num_swaps = n * (n - 1) // 2
+        swap_indices = range(num_swaps)
+        if num_swaps > self.max_neighbors // 2:
+            swap_indices = self._rng.sample(swap_indices, self.max_neighbors // 2)
+
+        for m in swap_indices:
+            i, j = self._swap_pair(n, m)
             new_order = list(task_order)
             new_order[i], new_order[j] = new_order[j], new_order[i]
 
-            move = Move("swap", task_order[i], task_order[j])
+            move = self._swap_slot(task_order[i], task_order[j])
+            key = current.key + (
+                task_keys[task_order[i]] - task_keys[task_order[j]]
+            ) * (position_keys[j] - position_keys[i])
             neighbor = Solution(
-                task_order=new_order, team_assignment=list(current.team_assignment)
+                task_order=new_order,
+                team_assignment=list(current.team_assignment),
+                key=key & 0xFFFFFFFFFFFFFFFF,
             )
             neighbors.append((neighbor, move))
 
-        reassign_candidates = []
-        for tid in self.tasks_with_teams:
-            opts = self.compatible_teams_indices[tid]
-            if len(opts) > 1:
-                current_team_idx = current.team_assignment[tid]
-                for new_team_idx in opts:
-                    if new_team_idx != current_team_idx:
-                        reassign_candidates.append((tid, new_team_idx))
-
-        if len(reassign_candidates) > self.max_neighbors // 2:
-            reassign_candidates = random.sample(
-                reassign_candidates, self.max_neighbors // 2
+        reassign_indices = range(self.num_reassignments)
+        if self.num_reassignments > self.max_neighbors // 2:
+            reassign_indices = self._rng.sample(
+                reassign_indices, self.max_neighbors // 2
             )
 
-        for tid, new_team_idx in reassign_candidates:
+        for m in reassign_indices:
+            slot = bisect.bisect_right(self.reassign_offsets, m) - 1
+            tid = self.reassign_tasks[slot]
+            k = m - self.reassign_offsets[slot]
+            opts = self.compatible_teams_indices[tid]
+            # k-th option other than the current team
+            if current.team_assignment[tid] in opts[: k + 1]:
+                k += 1
+            new_team_idx = opts[k]
             new_assignment = list(current.team_assignment)
             new_assignment[tid] = new_team_idx
 
-            move = Move("team", tid, new_team_idx)
+            move = self._team_slot(tid, new_team_idx)
+            key = current.key + task_keys[tid] * (
+                team_keys[new_team_idx] - team_keys[current.team_assignment[tid]]
+            )
             neighbor = Solution(
-                task_order=list(current.task_order), team_assignment=new_assignment
+                task_order=list(current.task_order),
+                team_assignment=new_assignment,
+                key=key & 0xFFFFFFFFFFFFFFFF,
             )
             neighbors.append((neighbor, move))
 
         return neighbors
 
-    def _is_tabu(
-        self, move: Move, tabu_list: Dict[Move, int], current_iter: int
-    ) -> bool:
-        if move not in tabu_list:
-            return False
-        return tabu_list[move] > current_iter
+    def _is_tabu(self, move: int, tabu_expiry: "array[int]", current_iter: int) -> bool:
+        return tabu_expiry[move] > current_iter
 
     def map_result(
         self,
@@ -247,7 +341,7 @@ class TabuSearchMiddleware(MapResult):
         time_limit: float = float("inf"),
     ) -> Schedule:
         self._preprocess(problem)
-        random.seed(self.seed)
+        self._rng = random.Random(self.seed)
 
         if not self.tasks_with_teams:
             return result
@@ -259,18 +353,24 @@ class TabuSearchMiddleware(MapResult):
             best = current
             best_score = current_score
 
-            tabu_list: Dict[Move, int] = {}
+            # Iteration until which each move slot stays tabu; a swap shares
+            # its slot with the reverse swap. Expired entries need no sweep.
+            tabu_expiry = array("l", [0]) * self.num_tabu_slots
             iteration = 0
 
             while not budget.is_expired():
                 iteration += 1
 
-                neighbors = self._get_neighbors(current, tabu_list, iteration)
+                neighbors = self._get_neighbors(current, tabu_expiry, iteration)
                 if not neighbors:
                     break
+                if self.first_improvement:
+                    # Small neighborhoods come in index order; do not favour
+                    # the moves that happen to be listed first
+                    self._rng.shuffle(neighbors)
 
                 best_neighbor = None
-                best_neighbor_score = (sys.maxsize, sys.maxsize, sys.maxsize)
+                best_neighbor_score = None
                 best_move = None
 
                 for neighbor, move in neighbors:
@@ -278,7 +378,7 @@ class TabuSearchMiddleware(MapResult):
                         break
 
                     score = self._evaluate(neighbor)
-                    is_tabu = self._is_tabu(move, tabu_list, iteration)
+                    is_tabu = self._is_tabu(move, tabu_expiry, iteration)
 
                     if is_tabu:
                         if score < best_score:
@@ -286,18 +386,22 @@ class TabuSearchMiddleware(MapResult):
                         else:
                             continue
 
-                    if score < best_neighbor_score:
+                    if best_neighbor_score is None or score < best_neighbor_score:
                         best_neighbor = neighbor
                         best_neighbor_score = score
                         best_move = move
 
-                if best_neighbor is None:
+                        if self.first_improvement and score < current_score:
+                            break
+
+                # Both are set together; checking the score too narrows it
+                if best_neighbor is None or best_neighbor_score is None:
                     # Diversification
                     task_order = list(self.tasks_with_teams)
-                    random.shuffle(task_order)
+                    self._rng.shuffle(task_order)
                     team_assignment = [0] * self.num_tasks
                     for tid in self.tasks_with_teams:
-                        team_assignment[tid] = random.choice(
+                        team_assignment[tid] = self._rng.choice(
                             self.compatible_teams_indices[tid]
                         )
                     current = Solution(
@@ -309,19 +413,11 @@ class TabuSearchMiddleware(MapResult):
                 current = best_neighbor
                 current_score = best_neighbor_score
 
-                if best_move:
-                    tabu_list[best_move] = iteration + self.tabu_tenure
-                    if best_move.move_type == "swap":
-                        reverse = Move("swap", best_move.task_id_2, best_move.task_id_1)
-                        tabu_list[reverse] = iteration + self.tabu_tenure
+                if best_move is not None:
+                    tabu_expiry[best_move] = iteration + self.tabu_tenure
 
                 if current_score < best_score:
                     best = current
                     best_score = current_score
 
-                if iteration % 100 == 0:
-                    tabu_list = {
-                        m: exp for m, exp in tabu_list.items() if exp > iteration
-                    }
-
-        return Schedule(assignments=self._decode(best))
+        return Schedule(assignments=self._decode(best)[0])
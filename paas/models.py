@@ -1,24 +1,32 @@
+import sys
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import Any, Dict, List
 
+# Keyword arguments for the hot-path dataclasses: slots give smaller
+# instances and faster attribute access, but need Python 3.10+, so on the
+# 3.8 judge these classes keep a per-instance __dict__.
+DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**DATACLASS_SLOTS)
 class Task:
     id: int
     duration: int
     predecessors: List[int] = field(default_factory=list)
     successors: List[int] = field(default_factory=list)
-    # Map of compatible team_id -> cost
+    # Map of compatible team_id -> cost.
+    # Treated as read-only once parsed: preprocessing middlewares share the
+    # same dict between the original and the mapped problem instead of copying.
     compatible_teams: Dict[int, int] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Team:
     id: int
     available_from: int
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class ProblemInstance:
     num_tasks: int
     num_teams: int
@@ -41,14 +49,111 @@ class ProblemInstance:
             )
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
+class CompiledProblem:
+    """
+    Struct-of-arrays view of a ProblemInstance for the search middlewares:
+    every per-task and per-team field is a list indexed by id, sized by the
+    largest id + 1. Build it once per run with `from_problem` and index it
+    in the hot loops instead of going through the Task / Team dicts.
+    """
+
+    durations: List[int]
+    predecessors: List[List[int]]
+    successors: List[List[int]]
+    in_degrees: List[int]
+    # Compatible team ids of each task, in the order of Task.compatible_teams
+    compatible_teams: List[List[int]]
+    # Dense task x team costs, INCOMPATIBLE_COST where a team cannot do a task
+    team_costs: List[List[int]]
+    team_available_from: List[int]
+    # Tasks with at least one compatible team, in problem order
+    tasks_with_teams: List[int]
+
+    INCOMPATIBLE_COST = 10**12
+
+    @classmethod
+    def from_problem(cls, problem: ProblemInstance) -> "CompiledProblem":
+        num_slots = max(problem.tasks, default=-1) + 1
+        num_team_slots = max(problem.teams, default=-1) + 1
+
+        team_available_from = [0] * num_team_slots
+        for tid, team in problem.teams.items():
+            team_available_from[tid] = team.available_from
+
+        durations = [0] * num_slots
+        predecessors: List[List[int]] = [[] for _ in range(num_slots)]
+        successors: List[List[int]] = [[] for _ in range(num_slots)]
+        in_degrees = [0] * num_slots
+        compatible_teams: List[List[int]] = [[] for _ in range(num_slots)]
+        team_costs = [
+            [cls.INCOMPATIBLE_COST] * num_team_slots for _ in range(num_slots)
+        ]
+        tasks_with_teams = []
+
+        for tid, task in problem.tasks.items():
+            durations[tid] = task.duration
+            predecessors[tid] = task.predecessors
+            successors[tid] = task.successors
+            in_degrees[tid] = len(task.predecessors)
+
+            if task.compatible_teams:
+                tasks_with_teams.append(tid)
+
+            compatible_teams[tid] = list(task.compatible_teams)
+            for team_id, cost in task.compatible_teams.items():
+                team_costs[tid][team_id] = cost
+
+        return cls(
+            durations=durations,
+            predecessors=predecessors,
+            successors=successors,
+            in_degrees=in_degrees,
+            compatible_teams=compatible_teams,
+            team_costs=team_costs,
+            team_available_from=team_available_from,
+            tasks_with_teams=tasks_with_teams,
+        )
+
+
+def critical_path_ranks(problem: ProblemInstance) -> Dict[int, int]:
+    """
+    Longest duration path from each task to a sink, the task's own duration
+    included. Computed sinks first (Kahn's algorithm on the successors), so
+    deep chains need no recursion. Predecessors that are not in the problem
+    are ignored; tasks on a cycle, or leading into one, get no rank.
+    """
+    tasks = problem.tasks
+    successors: Dict[int, List[int]] = {tid: [] for tid in tasks}
+    for tid, task in tasks.items():
+        for pred in task.predecessors:
+            if pred in successors:
+                successors[pred].append(tid)
+
+    ranks: Dict[int, int] = {}
+    remaining_successors = {tid: len(succ) for tid, succ in successors.items()}
+    stack = [tid for tid, count in remaining_successors.items() if count == 0]
+    while stack:
+        tid = stack.pop()
+        ranks[tid] = tasks[tid].duration + max(
+            (ranks[s] for s in successors[tid]), default=0
+        )
+        for pred in tasks[tid].predecessors:
+            if pred in remaining_successors:
+                remaining_successors[pred] -= 1
+                if remaining_successors[pred] == 0:
+                    stack.append(pred)
+    return ranks
+
+
+@dataclass(**DATACLASS_SLOTS)
 class Assignment:
     task_id: int
     team_id: int
     start_time: int
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Schedule:
     assignments: List[Assignment]
 
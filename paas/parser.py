@@ -1,11 +1,11 @@
-from typing import TextIO, Iterator
+from typing import Dict, List, TextIO
 from .models import ProblemInstance, Task, Team, Schedule, Assignment
 
 
-def _token_iterator(input_stream: TextIO) -> Iterator[str]:
-    for line in input_stream:
-        for token in line.split():
-            yield token
+def _read_ints(input_stream: TextIO) -> List[int]:
+    # One read and split for the whole stream; the sections are then sliced
+    # out of the list instead of being consumed token by token.
+    return list(map(int, input_stream.read().split()))
 
 
 def parse_solution(input_stream: TextIO) -> Schedule:
@@ -16,21 +16,19 @@ def parse_solution(input_stream: TextIO) -> Schedule:
     - N (number of assigned tasks)
     - N lines of assignments (task_id team_id start_time)
     """
-    tokens = _token_iterator(input_stream)
-
-    try:
-        n_str = next(tokens)
-    except StopIteration:
+    data = _read_ints(input_stream)
+    if not data:
         raise ValueError("Solution input is empty")
 
-    num_assignments = int(n_str)
-    assignments = []
+    num_assignments = data[0]
+    body = data[1 : 1 + 3 * num_assignments]
+    if len(body) < 3 * num_assignments:
+        raise ValueError("Solution input is incomplete")
 
-    for _ in range(num_assignments):
-        task_id = int(next(tokens))
-        team_id = int(next(tokens))
-        start_time = int(next(tokens))
-        assignments.append(Assignment(task_id, team_id, start_time))
+    assignments = [
+        Assignment(task_id, team_id, start_time)
+        for task_id, team_id, start_time in zip(body[0::3], body[1::3], body[2::3])
+    ]
 
     return Schedule(assignments)
 
@@ -48,44 +46,58 @@ def parse_input(input_stream: TextIO) -> ProblemInstance:
     - K
     - K lines of costs (i j c)
     """
-    tokens = _token_iterator(input_stream)
-
-    try:
-        n_str = next(tokens)
-        q_str = next(tokens)
-    except StopIteration:
+    data = _read_ints(input_stream)
+    if len(data) < 2:
         raise ValueError("Input is empty or incomplete")
 
-    N = int(n_str)
-    Q = int(q_str)
-
-    tasks = {i: Task(id=i, duration=0) for i in range(1, N + 1)}
-
-    for _ in range(Q):
-        u = int(next(tokens))
-        v = int(next(tokens))
-        tasks[v].predecessors.append(u)
-        tasks[u].successors.append(v)
-
-    for i in range(1, N + 1):
-        d = int(next(tokens))
-        tasks[i].duration = d
+    # The sections are read as slices of the token list and attached to the
+    # tasks in bulk, through lists indexed by task id.
+    N, Q = data[0], data[1]
+    pos = 2
 
-    M = int(next(tokens))
-
-    teams = {}
-    for j in range(1, M + 1):
-        s = int(next(tokens))
-        teams[j] = Team(id=j, available_from=s)
-
-    K = int(next(tokens))
+    edges = data[pos : pos + 2 * Q]
+    pos += 2 * Q
+    durations = data[pos : pos + N]
+    pos += N
+    if len(edges) < 2 * Q or len(durations) < N or pos >= len(data):
+        raise ValueError("Input is empty or incomplete")
+    if edges and (min(edges) < 1 or max(edges) > N):
+        raise ValueError("Dependency refers to an unknown task")
+
+    predecessors: List[List[int]] = [[] for _ in range(N + 1)]
+    successors: List[List[int]] = [[] for _ in range(N + 1)]
+    for u, v in zip(edges[0::2], edges[1::2]):
+        predecessors[v].append(u)
+        successors[u].append(v)
+
+    M = data[pos]
+    pos += 1
+    start_times = data[pos : pos + M]
+    pos += M
+    if len(start_times) < M or pos >= len(data):
+        raise ValueError("Input is empty or incomplete")
+    teams = {j: Team(id=j, available_from=s) for j, s in enumerate(start_times, 1)}
 
-    for _ in range(K):
-        task_id = int(next(tokens))
-        team_id = int(next(tokens))
-        cost = int(next(tokens))
+    K = data[pos]
+    pos += 1
+    costs = data[pos : pos + 3 * K]
+    if len(costs) < 3 * K:
+        raise ValueError("Input is empty or incomplete")
 
-        if task_id in tasks:
-            tasks[task_id].compatible_teams[team_id] = cost
+    compatible_teams: List[Dict[int, int]] = [{} for _ in range(N + 1)]
+    for task_id, team_id, cost in zip(costs[0::3], costs[1::3], costs[2::3]):
+        if 1 <= task_id <= N:
+            compatible_teams[task_id][team_id] = cost
+
+    tasks = {
+        i: Task(
+            id=i,
+            duration=durations[i - 1],
+            predecessors=predecessors[i],
+            successors=successors[i],
+            compatible_teams=compatible_teams[i],
+        )
+        for i in range(1, N + 1)
+    }
 
     return ProblemInstance(num_tasks=N, num_teams=M, tasks=tasks, teams=teams)
@@ -1,10 +1,30 @@
-from .cp_solver import CPSolver
-from .aco_solver import ACOSolver
-from .pso_solver import PSOSolver
-from .greedy_min_start_time import GreedyMinStartTimeSolver
-from .critical_path_slack import CriticalPathSlackSolver
-from .ilp_solver import ILPSolver
-from .random_solver import RandomSolver
+"""
+Solvers are imported on first access (PEP 562), so that using one of them
+does not import the dependencies of the others (e.g. ortools for CPSolver).
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .cp_solver import CPSolver
+    from .aco_solver import ACOSolver
+    from .pso_solver import PSOSolver
+    from .greedy_min_start_time import GreedyMinStartTimeSolver
+    from .critical_path_slack import CriticalPathSlackSolver
+    from .ilp_solver import ILPSolver
+    from .random_solver import RandomSolver
+
+# Exported name -> submodule defining it
+_SOLVER_MODULES = {
+    "CPSolver": ".cp_solver",
+    "ACOSolver": ".aco_solver",
+    "PSOSolver": ".pso_solver",
+    "GreedyMinStartTimeSolver": ".greedy_min_start_time",
+    "CriticalPathSlackSolver": ".critical_path_slack",
+    "ILPSolver": ".ilp_solver",
+    "RandomSolver": ".random_solver",
+}
 
 __all__ = [
     "CPSolver",
@@ -15,3 +35,17 @@ __all__ = [
     "ILPSolver",
     "RandomSolver",
 ]
+
+
+def __getattr__(name: str):
+    module = _SOLVER_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # Cache it so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
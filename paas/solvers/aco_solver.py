@@ -1,15 +1,17 @@
+import concurrent.futures
+import contextlib
 import random
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, repeat
 from typing import List, Dict, Optional
-from paas.models import ProblemInstance, Schedule, Assignment
+from paas.models import Assignment, CompiledProblem, ProblemInstance, Schedule
 from paas.middleware.base import Solver
 from paas.time_budget import TimeBudget
 
 
 class Ant:
-    def __init__(self, num_tasks: int, num_teams: int):
+    def __init__(self):
         self.assignments: List[Assignment] = []
-        self.team_free_time: Dict[int, int] = {}
-        self.task_finish_time: Dict[int, int] = {}
 
         # Objectives
         self.makespan = 0
@@ -17,6 +19,21 @@ class Ant:
         self.num_scheduled = 0
 
 
+# The solver of a worker process, set once per pool by `_init_worker` so
+# that the preprocessed tables are not sent along with every batch of ants
+_worker_solver: Optional["ACOSolver"] = None
+
+
+def _init_worker(solver: "ACOSolver"):
+    global _worker_solver
+    _worker_solver = solver
+
+
+def _construct_ant_in_worker(weights: List[List[float]], seed: int) -> Ant:
+    assert _worker_solver is not None
+    return _worker_solver._construct_ant(weights, random.Random(seed))
+
+
 class ACOSolver(Solver):
     """
     Ant Colony Optimization (ACO) based solver for the Project Assignment and Scheduling (PaaS) problem.
@@ -32,6 +49,7 @@ class ACOSolver(Solver):
         q_reward: float = 1000.0,
         seed: int = 8,
         time_factor: float = 1.0,
+        num_workers: int = 1,
     ):
         super().__init__(time_factor)
         self.alpha = alpha
@@ -41,52 +59,177 @@ class ACOSolver(Solver):
         self.iterations = iterations
         self.q_reward = q_reward
         self.seed = seed
+        # Ants of an iteration are independent; with num_workers > 1 they are
+        # built in separate processes, each ant from its own derived seed.
+        self.num_workers = num_workers
 
-    def _calculate_heuristic(
-        self,
-        task_id: int,
-        team_id: int,
-        current_team_time: int,
-        task_ready_time: int,
-        problem: ProblemInstance,
-    ) -> float:
-        task = problem.tasks[task_id]
-        duration = task.duration
-        cost = task.compatible_teams[team_id]
-        start_time = max(current_team_time, task_ready_time)
-        finish_time = start_time + duration
-
-        # Heuristic: Earlier finish time and Lower cost are better
-        h_time = 1.0 / (finish_time + 1.0)
-        h_cost = 1.0 / (cost + 1.0)
-        return (h_time**1.5) * (h_cost**0.5)
+    def _preprocess(self, problem: ProblemInstance):
+        """
+        Flatten the problem into lists indexed by task / team id once per run,
+        so that ant construction indexes lists instead of the Task dicts.
+        """
+        compiled = CompiledProblem.from_problem(problem)
+        self.durations = compiled.durations
+        self.in_degrees = compiled.in_degrees
+        self.team_available_from = compiled.team_available_from
+        self.compatible_teams = compiled.compatible_teams
+        self.team_costs = compiled.team_costs
+        # task -> {team_id: position in compatible_teams[task]}, which is also
+        # the position of the pair's pheromone level
+        self.team_slots: List[Dict[int, int]] = [
+            {team_id: slot for slot, team_id in enumerate(teams)}
+            for teams in compiled.compatible_teams
+        ]
+
+        # Successors derived from the predecessor lists, in problem order
+        self.successors: List[List[int]] = [[] for _ in compiled.durations]
+        for tid, task in problem.tasks.items():
+            for p in task.predecessors:
+                self.successors[p].append(tid)
+        self.root_tasks: List[int] = [
+            tid for tid, task in problem.tasks.items() if not task.predecessors
+        ]
+
+        # Heuristic: Earlier finish time and Lower cost are better,
+        #   eta = (1 / (finish + 1)) ** 1.5 * (1 / (cost + 1)) ** 0.5
+        # so eta ** beta = (finish + 1) ** (-1.5 * beta) * cost_weight, where
+        # the cost weight (cost + 1) ** (-0.5 * beta) of each (task, team) pair
+        # never changes. It is computed once, in the order of compatible_teams.
+        self.cost_weights: List[List[float]] = [[] for _ in compiled.durations]
+        cost_exponent = -0.5 * self.beta
+        for tid, task in problem.tasks.items():
+            self.cost_weights[tid] = [
+                (cost + 1.0) ** cost_exponent for cost in task.compatible_teams.values()
+            ]
+
+    def _construct_ant(self, weights: List[List[float]], rng: random.Random) -> Ant:
+        """
+        Build one ant's schedule by repeatedly drawing a (ready task, team)
+        pair with probability (tau ** alpha) * (eta ** beta). 'weights' holds
+        the parts fixed within an iteration, (tau ** alpha) * cost_weight,
+        laid out like the pheromones.
+        Requires _preprocess(problem) to have been called.
+        """
+        time_exponent = -1.5 * self.beta
+        durations = self.durations
+        successors = self.successors
+        compatible_teams = self.compatible_teams
+        team_costs = self.team_costs
+
+        ant = Ant()
+        assignments = ant.assignments
+        team_free_time = self.team_available_from[:]
+        # Latest finish among the placed predecessors of each task, pushed
+        # forward as tasks are placed
+        task_ready_time = [0] * len(durations)
+        current_indegree = self.in_degrees[:]
+        # Ready tasks as an insertion-ordered dict: the same order as a list
+        # that appends newly ready tasks, but with O(1) removal
+        available_tasks: Dict[int, None] = dict.fromkeys(self.root_tasks)
+        makespan = 0
+        total_cost = 0
+
+        while available_tasks:
+            # Candidate probabilities of all (ready task, team) pairs, each
+            # task's teams computed in one batch. The pairs themselves are not
+            # materialized: cand_tasks[k]'s teams start at probs[offsets[k]].
+            cand_tasks: List[int] = []
+            offsets: List[int] = []
+            probs: List[float] = []
+            for task_id in available_tasks:
+                teams = compatible_teams[task_id]
+                # Tasks with no compatible teams yield no candidates (should be handled by middleware)
+                if not teams:
+                    continue
+
+                ready_time = task_ready_time[task_id]
+                finish_base = durations[task_id] + 1.0
+                cand_tasks.append(task_id)
+                offsets.append(len(probs))
+                probs.extend(
+                    [
+                        weight
+                        * (max(team_free_time[team_id], ready_time) + finish_base)
+                        ** time_exponent
+                        for team_id, weight in zip(teams, weights[task_id])
+                    ]
+                )
+
+            if not probs:
+                break
+
+            # Selection: roulette over the running sums
+            total_prob = sum(probs)
+            if total_prob == 0:
+                chosen = rng.randrange(len(probs))
+            else:
+                r = rng.uniform(0, total_prob)
+                chosen = min(bisect_left(list(accumulate(probs)), r), len(probs) - 1)
+
+            # Execute Assignment
+            k = bisect_right(offsets, chosen) - 1
+            task_id = cand_tasks[k]
+            team_id = compatible_teams[task_id][chosen - offsets[k]]
+            start = max(team_free_time[team_id], task_ready_time[task_id])
+            finish = start + durations[task_id]
+
+            assignments.append(Assignment(task_id, team_id, start))
+            team_free_time[team_id] = finish
+            total_cost += team_costs[task_id][team_id]
+            if finish > makespan:
+                makespan = finish
+
+            del available_tasks[task_id]
+            for succ in successors[task_id]:
+                if finish > task_ready_time[succ]:
+                    task_ready_time[succ] = finish
+                current_indegree[succ] -= 1
+                if current_indegree[succ] == 0:
+                    available_tasks[succ] = None
+
+        ant.makespan = makespan
+        ant.total_cost = total_cost
+        ant.num_scheduled = len(assignments)
+        return ant
 
     def run(
         self, problem: ProblemInstance, time_limit: float = float("inf")
     ) -> Schedule:
-        random.seed(self.seed)
-
-        with TimeBudget(time_limit) as budget:
-            N = problem.num_tasks
-            M = problem.num_teams
-
-            # Pre-calculate successors for graph traversal logic
-            successors: Dict[int, List[int]] = {tid: [] for tid in problem.tasks}
-            indegree_base: Dict[int, int] = {tid: 0 for tid in problem.tasks}
-            for tid, task in problem.tasks.items():
-                indegree_base[tid] = len(task.predecessors)
-                for p in task.predecessors:
-                    if p not in successors:
-                        successors[p] = []
-                    successors[p].append(tid)
+        rng = random.Random(self.seed)
+        self._preprocess(problem)
 
+        if self.num_workers > 1:
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_worker,
+                initargs=(self,),
+            )
+        else:
+            pool = contextlib.nullcontext()
+
+        with TimeBudget(time_limit) as budget, pool as executor:
             # Initialize Pheromones
-            # pheromones: task_id -> team_id -> level
-            pheromones: Dict[int, Dict[int, float]] = {}
-            for tid, task in problem.tasks.items():
-                pheromones[tid] = {}
-                for team_id in task.compatible_teams:
-                    pheromones[tid][team_id] = 1.0
+            # The level of (task, compatible_teams[slot]) is
+            # pheromones[task_id][slot] * scale: evaporation only shrinks the
+            # shared scale, and a deposit adds reward / scale to its pair.
+            pheromones: List[List[float]] = [
+                [1.0] * len(teams) for teams in self.compatible_teams
+            ]
+            scale = 1.0
+            team_slots = self.team_slots
+            cost_weights = self.cost_weights
+            alpha = self.alpha
+
+            # Ant weights (tau ** alpha) * cost_weight, without the factor
+            # scale ** alpha: it is common to every pair, so it does not change
+            # the roulette. Only the deposited pairs need updating.
+            def compute_weights() -> List[List[float]]:
+                return [
+                    [(tau**alpha) * weight for tau, weight in zip(row, weight_row)]
+                    for row, weight_row in zip(pheromones, cost_weights)
+                ]
+
+            weights = compute_weights()
 
             best_global_ant: Optional[Ant] = None
 
@@ -94,98 +237,30 @@ class ACOSolver(Solver):
                 if budget.is_expired():
                     break
 
-                ants: List[Ant] = []
-                for _ in range(self.num_ants):
-                    ant = Ant(N, M)
-                    for tid, team in problem.teams.items():
-                        ant.team_free_time[tid] = team.available_from
-
-                    current_indegree = indegree_base.copy()
-                    available_tasks = [
-                        tid for tid, deg in current_indegree.items() if deg == 0
+                if executor is None:
+                    ants: List[Ant] = [
+                        self._construct_ant(weights, rng) for _ in range(self.num_ants)
                     ]
-
-                    while available_tasks:
-                        candidates = []
-                        for task_id in available_tasks:
-                            ready_time = 0
-                            task = problem.tasks[task_id]
-                            for pred in task.predecessors:
-                                ready_time = max(
-                                    ready_time, ant.task_finish_time.get(pred, 0)
-                                )
-
-                            # Filter out tasks with no compatible teams (should be handled by middleware)
-                            if task_id in pheromones:
-                                for team_id in pheromones[task_id]:
-                                    tau = pheromones[task_id][team_id]
-                                    eta = self._calculate_heuristic(
-                                        task_id,
-                                        team_id,
-                                        ant.team_free_time[team_id],
-                                        ready_time,
-                                        problem,
-                                    )
-                                    prob = (tau**self.alpha) * (eta**self.beta)
-                                    candidates.append(
-                                        {
-                                            "task_id": task_id,
-                                            "team_id": team_id,
-                                            "prob": prob,
-                                            "ready": ready_time,
-                                        }
-                                    )
-
-                        if not candidates:
-                            break
-
-                        # Selection
-                        total_prob = sum(c["prob"] for c in candidates)
-                        if total_prob == 0:
-                            chosen = random.choice(candidates)
-                        else:
-                            r = random.uniform(0, total_prob)
-                            cumsum = 0
-                            chosen = candidates[-1]
-                            for c in candidates:
-                                cumsum += c["prob"]
-                                if r <= cumsum:
-                                    chosen = c
-                                    break
-
-                        # Execute Assignment
-                        task_id, team_id, r_time = (
-                            chosen["task_id"],
-                            chosen["team_id"],
-                            chosen["ready"],
+                else:
+                    # Only the weights and a seed per ant go to the workers
+                    ant_seeds = [rng.getrandbits(64) for _ in range(self.num_ants)]
+                    ants = list(
+                        executor.map(
+                            _construct_ant_in_worker,
+                            repeat(weights),
+                            ant_seeds,
+                            chunksize=-(-self.num_ants // self.num_workers),
                         )
-                        start = max(ant.team_free_time[team_id], r_time)
-                        finish = start + problem.tasks[task_id].duration
-                        cost = problem.tasks[task_id].compatible_teams[team_id]
-
-                        ant.assignments.append(Assignment(task_id, team_id, start))
-                        ant.team_free_time[team_id] = finish
-                        ant.task_finish_time[task_id] = finish
-                        ant.total_cost += cost
-                        ant.makespan = max(ant.makespan, finish)
-
-                        available_tasks.remove(task_id)
-                        if task_id in successors:
-                            for succ in successors[task_id]:
-                                current_indegree[succ] -= 1
-                                if current_indegree[succ] == 0:
-                                    available_tasks.append(succ)
-
-                    ant.num_scheduled = len(ant.assignments)
-                    ants.append(ant)
+                    )
 
                 if not ants:
                     continue
 
                 # Find best ant in this iteration
                 # Priority: Count DESC, makespan ASC, cost ASC
-                ants.sort(key=lambda x: (-x.num_scheduled, x.makespan, x.total_cost))
-                iter_best = ants[0]
+                iter_best = min(
+                    ants, key=lambda x: (-x.num_scheduled, x.makespan, x.total_cost)
+                )
 
                 # Update Global Best
                 if best_global_ant is None:
@@ -201,19 +276,26 @@ class ACOSolver(Solver):
                                 best_global_ant = iter_best
 
                 # Evaporation
-                for tid in pheromones:
-                    for team_id in pheromones[tid]:
-                        pheromones[tid][team_id] *= 1.0 - self.rho
+                scale *= 1.0 - self.rho
+                if scale < 1e-3:
+                    # Deposits are divided by the scale, so the stored levels
+                    # outgrow the true ones as it shrinks. Fold it back while
+                    # they are within 1000x, far from overflowing tau ** alpha.
+                    pheromones = [[tau * scale for tau in row] for row in pheromones]
+                    scale = 1.0
+                    weights = compute_weights()
 
                 # Update Pheromones (Global Best)
                 if best_global_ant and best_global_ant.num_scheduled > 0:
-                    reward = self.q_reward / (best_global_ant.makespan + 1.0)
+                    reward = self.q_reward / (best_global_ant.makespan + 1.0) / scale
                     for assignment in best_global_ant.assignments:
-                        if (
-                            assignment.task_id in pheromones
-                            and assignment.team_id in pheromones[assignment.task_id]
-                        ):
-                            pheromones[assignment.task_id][assignment.team_id] += reward
+                        task_id = assignment.task_id
+                        slot = team_slots[task_id][assignment.team_id]
+                        row = pheromones[task_id]
+                        row[slot] += reward
+                        weights[task_id][slot] = (row[slot] ** alpha) * (
+                            cost_weights[task_id][slot]
+                        )
 
             if best_global_ant:
                 return Schedule(assignments=best_global_ant.assignments)
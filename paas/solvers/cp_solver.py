@@ -1,7 +1,8 @@
-from typing import List
+from typing import Dict, List, Tuple
 from ortools.sat.python import cp_model
-from paas.models import ProblemInstance, Schedule, Assignment
+from paas.models import ProblemInstance, Schedule, Assignment, critical_path_ranks
 from paas.middleware.base import Solver
+from paas.solvers.critical_path_slack import CriticalPathSlackSolver
 from paas.time_budget import TimeBudget
 
 
@@ -10,8 +11,11 @@ class CPSolver(Solver):
     CP-SAT solver for the Project Assignment and Scheduling problem.
     """
 
-    def __init__(self, time_factor: float = 1.0):
+    def __init__(self, time_factor: float = 1.0, num_workers: int = 0):
         super().__init__(time_factor)
+        # Parallel portfolio workers for CP-SAT. 0 lets CP-SAT size the
+        # portfolio to the cores it may actually use.
+        self.num_workers = num_workers
 
     def run(
         self, problem: ProblemInstance, time_limit: float = float("inf")
@@ -20,22 +24,67 @@ class CPSolver(Solver):
             return Schedule(assignments=[])
 
         with TimeBudget(time_limit) as budget:
-            # Heuristic for the maximum possible time
+            # Upper bound on the completion time: a heuristic schedule's
+            # makespan, or a serial schedule after the latest team start
             max_duration = sum(t.duration for t in problem.tasks.values())
             max_start = max(
                 (t.available_from for t in problem.teams.values()), default=0
             )
-            horizon = max_duration + max_start + 1000
+            horizon = self._heuristic_horizon(problem, max_duration + max_start + 1000)
+
+            # Both stages share one model: the second stage only swaps the
+            # objective and bounds the makespan, so the interval variables
+            # and their propagators are built once.
+            model, start_times, presence, end_times = self._create_base_model(
+                problem, horizon
+            )
+
+            # Define makespan
+            makespan = model.NewIntVar(0, horizon, "makespan")
+            for task_id in problem.tasks:
+                model.Add(makespan >= end_times[task_id])
 
             # Lexicographical optimization:
             # 1. Minimize completion time
-            min_makespan = self._solve_min_makespan(problem, horizon, budget)
+            min_makespan = self._solve_min_makespan(
+                model, makespan, start_times, presence, horizon, budget
+            )
 
             # 2. Minimize total cost
-            assignments = self._solve_min_cost(problem, horizon, min_makespan, budget)
+            assignments = self._solve_min_cost(
+                problem, model, makespan, min_makespan, start_times, presence, budget
+            )
 
             return Schedule(assignments=assignments)
 
+    def _heuristic_horizon(self, problem: ProblemInstance, fallback: int) -> int:
+        """
+        Makespan of a quick CriticalPathSlackSolver schedule. That schedule is
+        feasible for the model, so an optimal one ends no later and the time
+        variables can be bounded by it. Returns 'fallback' when the heuristic
+        cannot place every task, or cannot run on the input (unknown teams or
+        predecessors, dependency cycles) while the model still can.
+        """
+        tasks = problem.tasks
+        if any(
+            team_id not in problem.teams
+            for task in tasks.values()
+            for team_id in task.compatible_teams
+        ):
+            return fallback
+        if any(p not in tasks for task in tasks.values() for p in task.predecessors):
+            return fallback
+        if len(critical_path_ranks(problem)) < len(tasks):
+            return fallback
+
+        schedule = CriticalPathSlackSolver().run(problem)
+        if len(schedule.assignments) < len(problem.tasks):
+            return fallback
+        return max(
+            a.start_time + problem.tasks[a.task_id].duration
+            for a in schedule.assignments
+        )
+
     def _create_base_model(self, problem: ProblemInstance, horizon: int):
         model = cp_model.CpModel()
 
@@ -77,7 +126,7 @@ class CPSolver(Solver):
                     start_times[task_id] >= problem.teams[team_id].available_from
                 ).OnlyEnforceIf(p_var)
 
-            model.Add(sum(task_team_vars) == 1)
+            model.AddExactlyOne(task_team_vars)
 
             # Precedence constraints
             for pred_id in task.predecessors:
@@ -92,56 +141,58 @@ class CPSolver(Solver):
 
         return model, start_times, presence, end_times
 
-    def _solve_min_makespan(
-        self, problem: ProblemInstance, horizon: int, budget: TimeBudget
-    ) -> int:
-        model, start_times, presence, end_times = self._create_base_model(
-            problem, horizon
-        )
-
-        # Define makespan
-        makespan = model.NewIntVar(0, horizon, "makespan")
-        for task_id in problem.tasks:
-            model.Add(makespan >= end_times[task_id])
-
-        model.Minimize(makespan)
-
+    def _new_solver(self, budget: TimeBudget) -> cp_model.CpSolver:
         solver = cp_model.CpSolver()
         if budget.remaining() < float("inf"):
             solver.parameters.max_time_in_seconds = budget.remaining()
+        solver.parameters.num_workers = self.num_workers
+        return solver
 
+    def _solve_min_makespan(
+        self,
+        model: cp_model.CpModel,
+        makespan: cp_model.IntVar,
+        start_times: Dict[int, cp_model.IntVar],
+        presence: Dict[Tuple[int, int], cp_model.IntVar],
+        horizon: int,
+        budget: TimeBudget,
+    ) -> int:
+        model.Minimize(makespan)
+
+        solver = self._new_solver(budget)
         status = solver.Solve(model)
 
         if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            # Warm start the next stage from this solution: it stays feasible
+            # under the makespan bound added there.
+            for var in start_times.values():
+                model.AddHint(var, solver.Value(var))
+            for var in presence.values():
+                model.AddHint(var, solver.BooleanValue(var))
             return int(solver.Value(makespan))
         return horizon
 
     def _solve_min_cost(
         self,
         problem: ProblemInstance,
-        horizon: int,
+        model: cp_model.CpModel,
+        makespan: cp_model.IntVar,
         min_makespan: int,
+        start_times: Dict[int, cp_model.IntVar],
+        presence: Dict[Tuple[int, int], cp_model.IntVar],
         budget: TimeBudget,
     ) -> List[Assignment]:
-        model, start_times, presence, end_times = self._create_base_model(
-            problem, horizon
-        )
-
-        for task_id in problem.tasks:
-            model.Add(end_times[task_id] <= min_makespan)
-
-        # Objective: minimize cost
-        total_cost = []
-        for (task_id, team_id), p_var in presence.items():
-            cost = problem.tasks[task_id].compatible_teams[team_id]
-            total_cost.append(p_var * cost)
-
-        model.Minimize(sum(total_cost))
+        model.ClearObjective()
+        model.Add(makespan <= min_makespan)
 
-        solver = cp_model.CpSolver()
-        if budget.remaining() < float("inf"):
-            solver.parameters.max_time_in_seconds = budget.remaining()
+        # Objective: minimize cost, built as one weighted sum
+        costs = [
+            problem.tasks[task_id].compatible_teams[team_id]
+            for task_id, team_id in presence
+        ]
+        model.Minimize(cp_model.LinearExpr.WeightedSum(list(presence.values()), costs))
 
+        solver = self._new_solver(budget)
         status = solver.Solve(model)
 
         assignments = []
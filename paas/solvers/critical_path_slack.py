@@ -1,4 +1,5 @@
-from paas.models import ProblemInstance, Schedule, Assignment
+import heapq
+from paas.models import ProblemInstance, Schedule, Assignment, critical_path_ranks
 from paas.middleware.base import Solver
 
 
@@ -25,20 +26,8 @@ class CriticalPathSlackSolver(Solver):
             for pred in task.predecessors:
                 successors[pred].append(tid)
 
-        memo_priority = {}
-
-        def compute_priority(tid):
-            if tid in memo_priority:
-                return memo_priority[tid]
-            max_succ_priority = 0
-            if successors[tid]:
-                max_succ_priority = max(compute_priority(s) for s in successors[tid])
-            res = tasks[tid].duration + max_succ_priority
-            memo_priority[tid] = res
-            return res
-
-        for tid in tasks:
-            compute_priority(tid)
+        # Longest duration path from each task to a sink
+        memo_priority = critical_path_ranks(problem)
 
         project_makespan_lb = max(memo_priority.values()) if memo_priority else 0
 
@@ -55,27 +44,30 @@ class CriticalPathSlackSolver(Solver):
             t_id: team.available_from for t_id, team in teams.items()
         }
         task_completion_time = {}
-        scheduled_task_ids = set()
         assignments = []
 
-        ready_tasks = set(tid for tid, t in tasks.items() if not t.predecessors)
+        # Ready tasks in a heap, most critical first: highest priority, then
+        # longest duration, then fewest compatible teams, then lowest id
+        def ready_entry(tid):
+            task = tasks[tid]
+            return (
+                -memo_priority[tid],
+                -task.duration,
+                len(task.compatible_teams),
+                tid,
+            )
+
+        ready_heap = [
+            ready_entry(tid) for tid, t in tasks.items() if not t.predecessors
+        ]
+        heapq.heapify(ready_heap)
         unscheduled_dependency_counts = {
             tid: len(t.predecessors) for tid, t in tasks.items()
         }
 
-        while len(scheduled_task_ids) < len(tasks):
-            if not ready_tasks:
-                break
-
+        while ready_heap:
             # Step A: Critical Path Selection
-            best_task_id = max(
-                ready_tasks,
-                key=lambda tid: (
-                    memo_priority[tid],
-                    tasks[tid].duration,
-                    -len(tasks[tid].compatible_teams),
-                ),
-            )
+            best_task_id = heapq.heappop(ready_heap)[-1]
 
             task = tasks[best_task_id]
             task_priority = memo_priority[best_task_id]
@@ -108,33 +100,28 @@ class CriticalPathSlackSolver(Solver):
             selected_team = None
 
             if safe_candidates:
-                # We sort by:
+                # We pick the smallest by:
                 # 1. Min Cost
                 # 2. Min Start Time
                 # 3. Min Versatility (The tie-breaker!)
-                safe_candidates.sort()
-                _, selected_start, _, selected_team = safe_candidates[0]
+                _, selected_start, _, selected_team = min(safe_candidates)
             elif unsafe_candidates:
-                unsafe_candidates.sort()
-                selected_start, _, _, selected_team = unsafe_candidates[0]
+                selected_start, _, _, selected_team = min(unsafe_candidates)
             else:
-                ready_tasks.remove(best_task_id)
                 continue
 
             # --- Update global states ---
             finish = selected_start + task.duration
             team_available_time[selected_team] = finish
             task_completion_time[best_task_id] = finish
-            scheduled_task_ids.add(best_task_id)
             assignments.append(Assignment(best_task_id, selected_team, selected_start))
 
             if selected_start + task_priority > project_makespan_lb:
                 project_makespan_lb = selected_start + task_priority
 
-            ready_tasks.remove(best_task_id)
             for succ_id in successors[best_task_id]:
                 unscheduled_dependency_counts[succ_id] -= 1
                 if unscheduled_dependency_counts[succ_id] == 0:
-                    ready_tasks.add(succ_id)
+                    heapq.heappush(ready_heap, ready_entry(succ_id))
 
         return Schedule(assignments)
@@ -1,5 +1,6 @@
-import sys
-from paas.models import ProblemInstance, Schedule, Assignment
+import heapq
+from typing import Dict, List, Tuple
+from paas.models import ProblemInstance, Schedule, Assignment, critical_path_ranks
 from paas.middleware.base import Solver
 
 
@@ -14,7 +15,8 @@ class GreedyMinStartTimeSolver(Solver):
         In each iteration, consider all unscheduled tasks whose dependencies are fully satisfied.
         Calculate the earliest possible start time for each compatible team (constrained by both
         team availability and predecessor completion times).
-        Select the assignment that yields the global minimum start time.
+        Select the assignment that yields the global minimum start time, breaking ties by
+        the longest remaining critical path (so downstream work starts early), then cost.
     """
 
     def __init__(self, time_factor: float = 0.0):
@@ -25,7 +27,6 @@ class GreedyMinStartTimeSolver(Solver):
     ) -> Schedule:
         tasks = problem.tasks
         teams = problem.teams
-        INF = sys.maxsize
 
         # Track when each team becomes free.
         # team_available_time: team_id -> time
@@ -33,13 +34,83 @@ class GreedyMinStartTimeSolver(Solver):
             t_id: team.available_from for t_id, team in teams.items()
         }
 
-        # Track when each task finishes.
-        # task_completion_time: task_id -> time
-        task_completion_time = {}
+        # Tasks are handled by their position in `tasks`, the order in which
+        # candidates are scanned (so ties go to the earliest task).
+        task_ids = list(tasks)
+        position = {tid: pos for pos, tid in enumerate(task_ids)}
+        successors: List[List[int]] = [[] for _ in task_ids]
+        remaining_preds = [0] * len(task_ids)
+        for pos, tid in enumerate(task_ids):
+            preds = tasks[tid].predecessors
+            remaining_preds[pos] = len(preds)
+            for p in preds:
+                if p in position:
+                    successors[position[p]].append(pos)
+        # Longest duration path from each task to a sink (tasks on cycles
+        # never become ready, so their rank does not matter)
+        ranks = critical_path_ranks(problem)
+        rank = [ranks.get(tid, 0) for tid in task_ids]
+
+        # Latest finish among the scheduled predecessors of each task
+        ready_time = [0] * len(task_ids)
+        # (team_id, cost) options of each task
+        team_options = [list(tasks[tid].compatible_teams.items()) for tid in task_ids]
+        scheduled = [False] * len(task_ids)
+
+        # Candidate (task, team) pairs of the ready tasks (those whose
+        # predecessors are all done) in a heap of
+        #   (start, -rank, cost, position, slot, team_id, team availability)
+        # The smallest valid entry is the pair to pick: the earliest start,
+        # then the longest critical path, then the lowest cost, then the
+        # first in scan order.
+        # A pair's start only changes when its team is used; the entries
+        # pushed before that are stale and skipped when popped.
+        candidates: List[Tuple[int, int, int, int, int, int, int]] = []
+        # team_id -> {position: (slot, cost)} for the ready tasks
+        ready_by_team: Dict[int, Dict[int, Tuple[int, int]]] = {
+            t_id: {} for t_id in teams
+        }
 
-        scheduled_task_ids = set()
         assignments = []
 
+        def push(pos: int, slot: int, team_id: int, cost: int):
+            team_avail = team_available_time[team_id]
+            heapq.heappush(
+                candidates,
+                (
+                    max(team_avail, ready_time[pos]),
+                    -rank[pos],
+                    cost,
+                    pos,
+                    slot,
+                    team_id,
+                    team_avail,
+                ),
+            )
+
+        def commit(pos: int, team_id: int, start: int):
+            # Record the assignment, then refresh the pairs of the team and
+            # release the successors of the task
+            task_id = task_ids[pos]
+            finish = start + tasks[task_id].duration
+            scheduled[pos] = True
+            assignments.append(Assignment(task_id, team_id, start))
+            for t_id, _ in team_options[pos]:
+                ready_by_team[t_id].pop(pos, None)
+
+            team_available_time[team_id] = finish
+            for other, (slot, cost) in ready_by_team[team_id].items():
+                push(other, slot, team_id, cost)
+
+            for s in successors[pos]:
+                if finish > ready_time[s]:
+                    ready_time[s] = finish
+                remaining_preds[s] -= 1
+                if remaining_preds[s] == 0:
+                    for slot, (t_id, cost) in enumerate(team_options[s]):
+                        ready_by_team[t_id][s] = (slot, cost)
+                        push(s, slot, t_id, cost)
+
         # --- Phase 1: Schedule Root Tasks ---
         # We explicitly handle tasks with no predecessors first.
         # Sort by ID to ensure deterministic behavior.
@@ -70,88 +141,19 @@ class GreedyMinStartTimeSolver(Solver):
             )
 
             if best_team_id is not None:
-                best_start_time = team_available_time[best_team_id]
                 # Commit the assignment
-                start = best_start_time
-                finish = start + task.duration
-
-                team_available_time[best_team_id] = finish
-                task_completion_time[task_id] = finish
-                scheduled_task_ids.add(task_id)
-                assignments.append(Assignment(task_id, best_team_id, start))
+                commit(
+                    position[task_id], best_team_id, team_available_time[best_team_id]
+                )
 
         # --- Phase 2: Schedule Remaining Tasks ---
-        # Repeatedly find the best (task, team) pair among all currently valid options.
-        while len(scheduled_task_ids) < len(tasks):
-            global_best_start = INF
-            global_best_team = -1
-            global_best_task = -1
-            global_best_cost = INF
-
-            found_candidate = False
-
-            # Identify candidates: tasks that are not yet scheduled but have all predecessors done.
-            # Note: This linear scan in the loop makes the complexity O(N^2 * M).
-            # Optimization: We could maintain a "ready set", but for now, we stick to the
-            # straightforward logic for clarity.
-            unscheduled_ids = [tid for tid in tasks if tid not in scheduled_task_ids]
-
-            if not unscheduled_ids:
-                break
-
-            for task_id in unscheduled_ids:
-                task = tasks[task_id]
-
-                # Check if dependencies are satisfied
-                # If any predecessor is not in task_completion_time, we can't schedule this yet.
-                if not all(p in task_completion_time for p in task.predecessors):
-                    continue
-
-                # Calculate the earliest time dependencies allow the task to start.
-                # It must start after *all* predecessors are finished.
-                min_start_from_preds = 0
-                if task.predecessors:
-                    min_start_from_preds = max(
-                        task_completion_time[p] for p in task.predecessors
-                    )
-
-                # Evaluate all compatible teams
-                for team_id, cost in task.compatible_teams.items():
-                    team_avail = team_available_time[team_id]
-
-                    # The task can start only when the team is free AND dependencies are done.
-                    start_time = max(team_avail, min_start_from_preds)
-
-                    # Update global best if this option is better
-                    if start_time < global_best_start:
-                        global_best_start = start_time
-                        global_best_team = team_id
-                        global_best_task = task_id
-                        global_best_cost = cost
-                        found_candidate = True
-                    elif start_time == global_best_start:
-                        if cost < global_best_cost:
-                            global_best_team = team_id
-                            global_best_task = task_id
-                            global_best_cost = cost
-                            found_candidate = True
-
-            if found_candidate:
-                # Commit the best assignment found in this iteration
-                task = tasks[global_best_task]
-                start = global_best_start
-                finish = start + task.duration
-
-                team_available_time[global_best_team] = finish
-                task_completion_time[global_best_task] = finish
-                scheduled_task_ids.add(global_best_task)
-                assignments.append(
-                    Assignment(global_best_task, global_best_team, start)
-                )
-            else:
-                # No valid candidate found.
-                # This can happen if there are cycles (deadlock) or impossible constraints
-                # (e.g., a task with no compatible teams) that weren't pruned.
-                break
+        # Repeatedly take the best (task, team) pair among all currently valid
+        # options. Tasks that never become ready (cycles, missing
+        # predecessors) or have no compatible team are left unscheduled.
+        while candidates:
+            start, _, _, pos, _, team_id, team_avail = heapq.heappop(candidates)
+            if scheduled[pos] or team_available_time[team_id] != team_avail:
+                continue
+            commit(pos, team_id, start)
 
         return Schedule(assignments)
@@ -1,6 +1,7 @@
+import heapq
 import random
 import math
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from paas.models import ProblemInstance, Schedule, Assignment
 from paas.middleware.base import Solver
 from paas.time_budget import TimeBudget
@@ -48,38 +49,65 @@ class PSOSolver(Solver):
         self.c2 = c2
         self.seed = seed
 
+    def _preprocess(self, problem: ProblemInstance):
+        """
+        Flatten the problem into plain lookup tables once per run, so that the
+        decoder does not chase Task attributes or recount in-degrees.
+        """
+        self.durations: Dict[int, int] = {}
+        self.successors: Dict[int, List[int]] = {}
+        # (team_id, cost) options per task
+        self.team_options: Dict[int, Tuple[Tuple[int, int], ...]] = {}
+        self.initial_in_degree: Dict[int, int] = {}
+        for tid, task in problem.tasks.items():
+            self.durations[tid] = task.duration
+            self.successors[tid] = task.successors
+            self.team_options[tid] = tuple(task.compatible_teams.items())
+            self.initial_in_degree[tid] = len(task.predecessors)
+
+        self.initial_team_times: Dict[int, int] = {
+            tid: team.available_from for tid, team in problem.teams.items()
+        }
+        self.root_tasks: List[int] = [
+            tid for tid, deg in self.initial_in_degree.items() if deg == 0
+        ]
+
     def _decode_particle(
         self, position: List[float], problem: ProblemInstance
     ) -> ScheduleResult:
         """
         Converts a continuous particle vector into a valid schedule using Serial SGS.
+        Requires _preprocess(problem) to have been called.
         """
         N = problem.num_tasks
         priorities = position[:N]  # Determines order
         team_selectors = position[N:]  # Determines WHO does it
 
+        durations = self.durations
+        successors = self.successors
+        team_options = self.team_options
+
         # Simulation state
-        current_team_times = {
-            tid: team.available_from for tid, team in problem.teams.items()
-        }
-        current_in_degree = {
-            tid: len(task.predecessors) for tid, task in problem.tasks.items()
-        }
-        valid_start_time_preds = {tid: 0 for tid in problem.tasks}
+        current_team_times = dict(self.initial_team_times)
+        current_in_degree = dict(self.initial_in_degree)
+        valid_start_time_preds = dict.fromkeys(current_in_degree, 0)
 
         result = ScheduleResult()
 
         # Task IDs are 1-indexed in problem.tasks
-        ready_tasks = [tid for tid, deg in current_in_degree.items() if deg == 0]
-
-        while ready_tasks:
+        # Max-heap on priority; ties go to the task that became ready first
+        ready_heap = [
+            (-priorities[tid - 1], seq, tid) for seq, tid in enumerate(self.root_tasks)
+        ]
+        heapq.heapify(ready_heap)
+        seq = len(ready_heap)
+
+        while ready_heap:
             # STEP A: SELECT TASK
             # priorities is 0-indexed, so we use tid-1
-            selected_task_id = max(ready_tasks, key=lambda tid: priorities[tid - 1])
-            ready_tasks.remove(selected_task_id)
+            selected_task_id = heapq.heappop(ready_heap)[2]
 
-            task = problem.tasks[selected_task_id]
-            options = list(task.compatible_teams.items())
+            options = team_options[selected_task_id]
 
             if not options:
                 continue
@@ -99,7 +127,7 @@ class PSOSolver(Solver):
             start_lim_team = current_team_times[assigned_team_id]
 
             actual_start_time = max(start_lim_preds, start_lim_team)
-            actual_finish_time = actual_start_time + task.duration
+            actual_finish_time = actual_start_time + durations[selected_task_id]
 
             # STEP D: UPDATE STATE
             current_team_times[assigned_team_id] = actual_finish_time
@@ -112,14 +140,17 @@ class PSOSolver(Solver):
             result.scheduled_count += 1
 
             # Unlock Successors
-            for neighbor_id in task.successors:
+            for neighbor_id in successors[selected_task_id]:
                 current_in_degree[neighbor_id] -= 1
                 valid_start_time_preds[neighbor_id] = max(
                     valid_start_time_preds[neighbor_id], actual_finish_time
                 )
 
                 if current_in_degree[neighbor_id] == 0:
-                    ready_tasks.append(neighbor_id)
+                    heapq.heappush(
+                        ready_heap, (-priorities[neighbor_id - 1], seq, neighbor_id)
+                    )
+                    seq += 1
 
         return result
 
@@ -146,6 +177,7 @@ class PSOSolver(Solver):
         self, problem: ProblemInstance, time_limit: float = float("inf")
     ) -> Schedule:
         random.seed(self.seed)
+        self._preprocess(problem)
 
         with TimeBudget(time_limit) as budget:
             dim = 2 * problem.num_tasks
@@ -57,6 +57,47 @@ class TestACOSolver(unittest.TestCase):
         self.assertEqual(assign_map[1].start_time, 0)
         self.assertEqual(assign_map[2].start_time, 10)
 
+    def test_long_run_with_large_alpha(self):
+        # Many evaporations with a large alpha must not overflow tau ** alpha
+        t1 = Task(id=1, duration=10, successors=[3], compatible_teams={1: 10, 2: 20})
+        t2 = Task(id=2, duration=10, successors=[3], compatible_teams={1: 20, 2: 10})
+        t3 = Task(
+            id=3, duration=10, predecessors=[1, 2], compatible_teams={1: 10, 2: 10}
+        )
+        tasks = {1: t1, 2: t2, 3: t3}
+        teams = {1: Team(id=1, available_from=0), 2: Team(id=2, available_from=0)}
+        problem = ProblemInstance(num_tasks=3, num_teams=2, tasks=tasks, teams=teams)
+
+        schedule = ACOSolver(alpha=4.0, iterations=2500, num_ants=2).run(problem)
+
+        self.assertEqual(len(schedule.assignments), 3)
+
+    def test_parallel_ants(self):
+        # Two chains 1 -> 2 -> 3 and 4 -> 5 -> 6
+        tasks = {}
+        for i in range(1, 7):
+            preds = [i - 1] if i % 3 != 1 else []
+            tasks[i] = Task(i, 5 + i, preds, [], {1: 10 + i, 2: 20 - i})
+        teams = {1: Team(1, 0), 2: Team(2, 3)}
+        problem = ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+        schedules = [
+            ACOSolver(num_ants=6, iterations=3, num_workers=workers).run(problem)
+            for workers in (2, 3)
+        ]
+
+        finish = {
+            a.task_id: a.start_time + tasks[a.task_id].duration
+            for a in schedules[0].assignments
+        }
+        self.assertEqual(len(schedules[0].assignments), len(tasks))
+        for a in schedules[0].assignments:
+            for p in tasks[a.task_id].predecessors:
+                self.assertGreaterEqual(a.start_time, finish[p])
+
+        # Every ant has its own seed, so the split over workers does not matter
+        self.assertEqual(schedules[0], schedules[1])
+
 
 if __name__ == "__main__":
     unittest.main()
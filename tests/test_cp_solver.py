@@ -166,6 +166,50 @@ class TestCPSolver(unittest.TestCase):
         schedule = self.solver.run(problem)
         self.assertEqual(len(schedule.assignments), 0)
 
+    def test_horizon_from_heuristic(self):
+        tasks = {
+            1: Task(id=1, duration=5, successors=[2], compatible_teams={1: 10}),
+            2: Task(id=2, duration=3, predecessors=[1], compatible_teams={1: 10}),
+        }
+        teams = {1: Team(id=1, available_from=2)}
+        problem = ProblemInstance(num_tasks=2, num_teams=1, tasks=tasks, teams=teams)
+
+        self.assertEqual(self.solver._heuristic_horizon(problem, 1000), 10)
+
+    def test_horizon_fallback_on_missing_predecessor(self):
+        # Task 7 does not exist; the model skips it, the heuristic cannot
+        tasks = {
+            1: Task(id=1, duration=5, predecessors=[7], compatible_teams={1: 10}),
+        }
+        teams = {1: Team(id=1, available_from=0)}
+        problem = ProblemInstance(num_tasks=1, num_teams=1, tasks=tasks, teams=teams)
+
+        self.assertEqual(self.solver._heuristic_horizon(problem, 1000), 1000)
+
+    def test_horizon_fallback_on_cycle(self):
+        # 0 -> 1 <-> 2
+        tasks = {
+            0: Task(id=0, duration=1, successors=[1], compatible_teams={1: 1}),
+            1: Task(
+                id=1,
+                duration=1,
+                predecessors=[0, 2],
+                successors=[2],
+                compatible_teams={1: 1},
+            ),
+            2: Task(
+                id=2,
+                duration=1,
+                predecessors=[1],
+                successors=[1],
+                compatible_teams={1: 1},
+            ),
+        }
+        teams = {1: Team(id=1, available_from=0)}
+        problem = ProblemInstance(num_tasks=3, num_teams=1, tasks=tasks, teams=teams)
+
+        self.assertEqual(self.solver._heuristic_horizon(problem, 1000), 1000)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from paas.models import Task, Team, ProblemInstance
+from paas.solvers.critical_path_slack import CriticalPathSlackSolver
+
+
+class TestCriticalPathSlackSolver(unittest.TestCase):
+    def test_critical_path_first(self):
+        # 1 -> 2 is the longer chain, so 1 goes before 3 on the single team
+        tasks = {
+            1: Task(id=1, duration=2, successors=[2], compatible_teams={1: 5}),
+            2: Task(id=2, duration=6, predecessors=[1], compatible_teams={1: 5}),
+            3: Task(id=3, duration=4, compatible_teams={1: 5}),
+        }
+        teams = {1: Team(id=1, available_from=0)}
+        problem = ProblemInstance(3, 1, tasks, teams)
+
+        schedule = CriticalPathSlackSolver().run(problem)
+
+        self.assertEqual(
+            [(a.task_id, a.start_time) for a in schedule.assignments],
+            [(1, 0), (2, 2), (3, 8)],
+        )
+
+    def test_deep_chain(self):
+        # Longer than the default recursion limit
+        n = 5000
+        tasks = {
+            i: Task(
+                id=i,
+                duration=1,
+                predecessors=[i - 1] if i > 1 else [],
+                compatible_teams={1: 1},
+            )
+            for i in range(1, n + 1)
+        }
+        teams = {1: Team(id=1, available_from=0)}
+        problem = ProblemInstance(n, 1, tasks, teams)
+
+        schedule = CriticalPathSlackSolver().run(problem)
+
+        self.assertEqual(len(schedule.assignments), n)
+        self.assertEqual(schedule.assignments[-1].start_time, n - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
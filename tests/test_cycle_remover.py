@@ -1,3 +1,4 @@
+import sys
 import unittest
 from paas.models import Task, ProblemInstance
 from paas.middleware.cycle_remover import CycleRemover
@@ -62,6 +63,72 @@ class TestCycleRemover(unittest.TestCase):
             3, t4_new.predecessors, "Task 4 should still have stale reference to 3"
         )
 
+    def removed_tasks(self, tasks):
+        problem = ProblemInstance(len(tasks), 0, tasks, {})
+        new_problem = CycleRemover().map_problem(problem)
+        return set(tasks) - set(new_problem.tasks)
+
+    def graph(self, edges, order):
+        preds = {tid: [] for tid in order}
+        succs = {tid: [] for tid in order}
+        for a, b in edges:
+            succs[a].append(b)
+            preds[b].append(a)
+        return {
+            tid: self.create_task(tid, preds=preds[tid], succs=succs[tid])
+            for tid in order
+        }
+
+    def test_cycle_longer_than_recursion_limit(self):
+        # Ring 0 -> 1 -> ... -> n-1 -> 0, entered from n+1 and left to n
+        n = sys.getrecursionlimit() * 2
+        edges = [(i, (i + 1) % n) for i in range(n)]
+        edges += [(n - 1, n), (n + 1, 0)]
+        tasks = self.graph(edges, list(range(n + 2)))
+
+        self.assertEqual(self.removed_tasks(tasks), set(range(n)))
+
+    def test_mixed_sccs(self):
+        edges = [
+            # SCC {1, 2, 3}, leading into the chain 4 -> 5
+            (1, 2),
+            (2, 3),
+            (3, 1),
+            (3, 4),
+            (4, 5),
+            # SCC {6, 7} with cross edges into {1, 2, 3} and 4
+            (6, 7),
+            (7, 6),
+            (7, 1),
+            (6, 4),
+            # Self-loops: 8 points into {1, 2, 3}, 10 leads into 11
+            (8, 8),
+            (8, 2),
+            (10, 10),
+            (10, 11),
+            # 9 only has cross edges into other SCCs
+            (9, 8),
+            (9, 6),
+            (9, 11),
+            # SCC {12, 13, 14, 15}: 15 closes a second loop through 14
+            (12, 13),
+            (13, 14),
+            (14, 12),
+            (13, 15),
+            (15, 14),
+            (15, 5),
+        ]
+        order = list(range(1, 16))
+
+        # The DFS roots, and so which SCCs are finished first, follow the
+        # task order
+        for tasks_order in (order, order[::-1]):
+            tasks = self.graph(edges, tasks_order)
+            self.assertEqual(
+                self.removed_tasks(tasks),
+                {1, 2, 3, 6, 7, 8, 10, 12, 13, 14, 15},
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from paas.middleware.decoding import decode_deferred
+
+
+class TestDecodeDeferred(unittest.TestCase):
+    def setUp(self):
+        # Chain 0 -> 1 -> 2 plus a free task 3, all on team 0
+        self.predecessors = [[], [0], [1], []]
+        self.durations = [1, 2, 3, 4]
+        self.team_costs = [[5], [6], [7], [8]]
+        self.teams = [0, 0, 0, 0]
+
+    def test_matches_repeated_passes(self):
+        # Against the order, passes over [2, 3, 1, 0] place 3 and 0 on the
+        # first pass, 1 on the second and 2 on the third
+        finish_times = [None] * 4
+        assignments = []
+
+        result = decode_deferred(
+            [2, 3, 1, 0],
+            self.predecessors,
+            self.durations,
+            self.team_costs,
+            self.teams,
+            finish_times,
+            [0],
+            assignments,
+        )
+
+        self.assertEqual(result, (4, 10, 26))
+        self.assertEqual(
+            [(a.task_id, a.start_time) for a in assignments],
+            [(3, 0), (0, 4), (1, 5), (2, 7)],
+        )
+        self.assertEqual(finish_times, [5, 7, 10, 4])
+
+    def test_scheduled_predecessors_and_limit(self):
+        # 0 is already done at 3 (-1 marks unscheduled tasks)
+        finish_times = [3, -1, -1, -1]
+        args = (
+            [2, 1],
+            self.predecessors,
+            self.durations,
+            self.team_costs,
+            self.teams,
+        )
+
+        result = decode_deferred(*args, finish_times[:], [0], None, unscheduled=-1)
+        self.assertEqual(result, (2, 3 + 2 + 3, 13))
+
+        self.assertIsNone(
+            decode_deferred(
+                *args, finish_times[:], [0], None, unscheduled=-1, makespan_limit=7
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
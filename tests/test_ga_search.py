@@ -0,0 +1,60 @@
+import unittest
+from paas.models import ProblemInstance, Task, Team
+from paas.middleware.ga_search import GAMiddleware
+from paas.solvers.greedy_min_start_time import GreedyMinStartTimeSolver
+
+
+def two_chains() -> ProblemInstance:
+    # Two chains 0 -> 1 -> 2 and 3 -> 4 -> 5
+    tasks = {}
+    for i in range(6):
+        preds = [i - 1] if i % 3 != 0 else []
+        succs = [i + 1] if i % 3 != 2 else []
+        tasks[i] = Task(i, 5 + i, preds, succs, {0: 10 + i, 1: 20 - i})
+    teams = {0: Team(0, 0), 1: Team(1, 3)}
+    return ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+
+class TestGAMiddleware(unittest.TestCase):
+    def test_chain_individual(self):
+        middleware = GAMiddleware()
+        middleware._preprocess(two_chains())
+
+        individual = middleware._chain_individual()
+        assert individual is not None
+
+        # The chains are interleaved, each task on the team that can start
+        # it first (4 starts at 11 on either team, team 0 is cheaper)
+        self.assertEqual(individual.task_order, [0, 3, 1, 4, 2, 5])
+        self.assertEqual(individual.team_assignment, [0, 0, 1, 1, 0, 0])
+
+    def test_chain_individual_needs_chains(self):
+        problem = two_chains()
+        # 2 now also waits for 4
+        problem.tasks[2].predecessors.append(4)
+        problem.tasks[4].successors.append(2)
+        middleware = GAMiddleware()
+        middleware._preprocess(problem)
+
+        self.assertIsNone(middleware._chain_individual())
+
+    def test_parallel_evaluation(self):
+        problem = two_chains()
+        tasks = problem.tasks
+        seed = GreedyMinStartTimeSolver().run(problem)
+
+        middleware = GAMiddleware(initial_population_size=6, num_workers=2)
+        schedule = middleware.map_result(problem, seed, time_limit=0.5)
+
+        finish = {
+            a.task_id: a.start_time + tasks[a.task_id].duration
+            for a in schedule.assignments
+        }
+        self.assertEqual(len(schedule.assignments), len(tasks))
+        for a in schedule.assignments:
+            for p in tasks[a.task_id].predecessors:
+                self.assertGreaterEqual(a.start_time, finish[p])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -73,6 +73,32 @@ class TestGreedyMinStartTimeSolver(unittest.TestCase):
         self.assertEqual(assign_map[1].team_id, 1)
         self.assertEqual(assign_map[2].team_id, 1)
 
+    def test_critical_path_breaks_ties(self):
+        # 1 -> 2, 1 -> 3 -> 4 on a single team
+        # 2 and 3 are ready together; 3 leads the longer path, so it goes
+        # first even though 2 is cheaper and comes first
+        tasks = {
+            1: Task(id=1, duration=1, successors=[2, 3], compatible_teams={1: 1}),
+            2: Task(id=2, duration=1, predecessors=[1], compatible_teams={1: 1}),
+            3: Task(
+                id=3,
+                duration=1,
+                predecessors=[1],
+                successors=[4],
+                compatible_teams={1: 5},
+            ),
+            4: Task(id=4, duration=10, predecessors=[3], compatible_teams={1: 1}),
+        }
+        teams = {1: Team(id=1, available_from=0)}
+        problem = ProblemInstance(4, 1, tasks, teams)
+
+        schedule = GreedyMinStartTimeSolver().run(problem)
+
+        self.assertEqual(
+            [(a.task_id, a.start_time) for a in schedule.assignments],
+            [(1, 0), (3, 1), (4, 2), (2, 12)],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -83,6 +83,88 @@ class TestHillClimbingMiddleware(unittest.TestCase):
 
         self.assertGreaterEqual(t1_start, t0_end)
 
+    def test_resumed_decode_matches_full_decode(self):
+        # Chain 0 -> 1 -> ... -> 9 plus independent tasks 10..19
+        tasks = {}
+        for i in range(20):
+            preds = [i - 1] if 0 < i < 10 else []
+            tasks[i] = Task(i, i % 4 + 1, preds, [], {0: 5, 1: 7})
+        teams = {0: Team(0, 0), 1: Team(1, 3)}
+        problem = ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+        order = list(range(20))
+        team_assignment = [i % 2 for i in range(20)]
+
+        middleware = HillClimbingMiddleware()
+        middleware._preprocess(problem)
+        middleware._evaluate(problem, order, team_assignment, record=True)
+
+        # Swap neighbor: positions before min(i, j) are unchanged
+        order[9], order[15] = order[15], order[9]
+        self.assertEqual(
+            middleware._evaluate(problem, order, team_assignment, start=9),
+            middleware._evaluate(problem, order, team_assignment),
+        )
+        order[9], order[15] = order[15], order[9]
+
+        # Team change neighbor: positions before the task are unchanged
+        team_assignment[12] = 0
+        self.assertEqual(
+            middleware._evaluate(problem, order, team_assignment, start=12),
+            middleware._evaluate(problem, order, team_assignment),
+        )
+
+    def test_neighbor_score_abandons_worse_neighbors(self):
+        # Two independent tasks on two identical teams: parallel is optimal
+        tasks = {
+            0: Task(0, 10, [], [], {0: 10, 1: 10}),
+            1: Task(1, 10, [], [], {0: 10, 1: 10}),
+        }
+        teams = {0: Team(0, 0), 1: Team(1, 0)}
+        problem = ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+        middleware = HillClimbingMiddleware()
+        middleware._preprocess(problem)
+
+        order = [0, 1]
+        _, parallel_score = middleware._evaluate(problem, order, [0, 1], record=True)
+        self.assertEqual(parallel_score, (-2, 10, 20))
+
+        # Moving task 1 onto team 0 serializes the tasks: rejected early
+        self.assertIsNone(
+            middleware._neighbor_score(problem, order, [0, 0], 1, parallel_score, 0)
+        )
+
+        # The reverse move is an improvement and gets a full score
+        _, serial_score = middleware._evaluate(problem, order, [0, 0], record=True)
+        self.assertEqual(
+            middleware._neighbor_score(problem, order, [0, 1], 1, serial_score, 0),
+            parallel_score,
+        )
+
+    def test_swap_noop_detection(self):
+        # 0 -> 1, task 2 independent
+        tasks = {
+            0: Task(0, 5, [], [], {0: 1, 1: 1}),
+            1: Task(1, 5, [0], [], {0: 1, 1: 1}),
+            2: Task(2, 5, [], [], {0: 1, 1: 1}),
+        }
+        teams = {0: Team(0, 0), 1: Team(1, 0)}
+        problem = ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+        middleware = HillClimbingMiddleware()
+        middleware._preprocess(problem)
+
+        order = [0, 2, 1]
+        # Independent tasks on different teams commute
+        self.assertTrue(middleware._swap_is_noop(order, [0, 0, 1], 0, 1))
+        # Same team: the order decides who goes first
+        self.assertFalse(middleware._swap_is_noop(order, [0, 1, 1], 1, 2))
+        # Direct dependency between the swapped tasks
+        self.assertFalse(middleware._swap_is_noop(order, [0, 1, 1], 0, 2))
+        # Task 1 in between depends on task 0, which would move past it
+        self.assertFalse(middleware._swap_is_noop([0, 1, 2], [0, 0, 1], 0, 2))
+
 
 if __name__ == "__main__":
     unittest.main()
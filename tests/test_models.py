@@ -0,0 +1,63 @@
+import unittest
+from paas.models import (
+    CompiledProblem,
+    ProblemInstance,
+    Task,
+    Team,
+    critical_path_ranks,
+)
+
+
+class TestCompiledProblem(unittest.TestCase):
+    def test_from_problem(self):
+        # 1 -> 3, task 2 has no compatible team; ids need not be continuous
+        tasks = {
+            1: Task(1, 5, [], [3], {2: 7, 0: 4}),
+            2: Task(2, 6, [], [], {}),
+            3: Task(3, 8, [1], [], {2: 9}),
+        }
+        teams = {0: Team(0, 10), 2: Team(2, 20)}
+        problem = ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+        compiled = CompiledProblem.from_problem(problem)
+        INF = CompiledProblem.INCOMPATIBLE_COST
+
+        self.assertEqual(compiled.durations, [0, 5, 6, 8])
+        self.assertEqual(compiled.predecessors, [[], [], [], [1]])
+        self.assertEqual(compiled.successors, [[], [3], [], []])
+        self.assertEqual(compiled.in_degrees, [0, 0, 0, 1])
+        self.assertEqual(compiled.compatible_teams, [[], [2, 0], [], [2]])
+        self.assertEqual(compiled.team_costs[1], [4, INF, 7])
+        self.assertEqual(compiled.team_costs[2], [INF, INF, INF])
+        self.assertEqual(compiled.team_available_from, [10, 0, 20])
+        self.assertEqual(compiled.tasks_with_teams, [1, 3])
+
+
+class TestCriticalPathRanks(unittest.TestCase):
+    def test_ranks(self):
+        # 1 -> 2 -> 4, 1 -> 3; 5 waits for the missing task 9
+        tasks = {
+            1: Task(1, 2, [], [2, 3], {0: 1}),
+            2: Task(2, 3, [1], [4], {0: 1}),
+            3: Task(3, 7, [1], [], {0: 1}),
+            4: Task(4, 1, [2], [], {0: 1}),
+            5: Task(5, 4, [9], [], {0: 1}),
+        }
+        problem = ProblemInstance(len(tasks), 1, tasks, {0: Team(0, 0)})
+
+        self.assertEqual(critical_path_ranks(problem), {1: 9, 2: 4, 3: 7, 4: 1, 5: 4})
+
+    def test_cycle_is_not_ranked(self):
+        # 0 -> 1 <-> 2
+        tasks = {
+            0: Task(0, 1, [], [1], {0: 1}),
+            1: Task(1, 1, [0, 2], [2], {0: 1}),
+            2: Task(2, 1, [1], [1], {0: 1}),
+        }
+        problem = ProblemInstance(len(tasks), 1, tasks, {0: Team(0, 0)})
+
+        self.assertEqual(critical_path_ranks(problem), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
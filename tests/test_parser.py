@@ -1,11 +1,9 @@
 import unittest
 from io import StringIO
+from paas.models import ProblemInstance, Task, Team
 from paas.parser import parse_input, parse_solution
 
-
-class TestParser(unittest.TestCase):
-    def test_example_parsing(self):
-        input_data = """5 4
+EXAMPLE_INPUT = """5 4
 1 2
 1 4
 2 5
@@ -28,7 +26,11 @@ class TestParser(unittest.TestCase):
 5 2 20
 5 5 10
 """
-        problem = parse_input(StringIO(input_data))
+
+
+class TestParser(unittest.TestCase):
+    def test_example_parsing(self):
+        problem = parse_input(StringIO(EXAMPLE_INPUT))
 
         self.assertEqual(problem.num_tasks, 5)
         self.assertEqual(problem.num_teams, 6)
@@ -49,6 +51,47 @@ class TestParser(unittest.TestCase):
         self.assertEqual(problem.teams[1].available_from, 100)
         self.assertEqual(problem.teams[6].available_from, 90)
 
+    def test_example_problem(self):
+        # The whole instance, as the token-by-token parser built it
+        expected = ProblemInstance(
+            num_tasks=5,
+            num_teams=6,
+            tasks={
+                1: Task(1, 60, [], [2, 4], {4: 20, 5: 30, 6: 10}),
+                2: Task(2, 45, [1], [5], {2: 25, 5: 30}),
+                3: Task(3, 120, [], [5], {1: 20, 6: 70}),
+                4: Task(4, 150, [1], [], {2: 10, 3: 10, 5: 20}),
+                5: Task(5, 20, [2, 3], [], {1: 40, 2: 20, 5: 10}),
+            },
+            teams={j: Team(j, s) for j, s in enumerate([100, 20, 65, 40, 25, 90], 1)},
+        )
+
+        self.assertEqual(parse_input(StringIO(EXAMPLE_INPUT)), expected)
+
+    def test_truncated_input(self):
+        tokens = EXAMPLE_INPUT.split()
+        # Cut inside the header, edges, durations, team count, start times,
+        # cost count and cost lines
+        for cut in (1, 2, 5, 12, 15, 16, 22, 23, 30, len(tokens) - 1):
+            with self.subTest(cut=cut):
+                with self.assertRaisesRegex(ValueError, "incomplete"):
+                    parse_input(StringIO(" ".join(tokens[:cut])))
+
+    def test_dependency_on_unknown_task(self):
+        for edge in ("0 1", "1 3", "3 2"):
+            with self.subTest(edge=edge):
+                data = f"2 1\n{edge}\n5 5\n1\n0\n1\n1 1 3\n"
+                with self.assertRaisesRegex(ValueError, "unknown task"):
+                    parse_input(StringIO(data))
+
+    def test_costs_of_unknown_tasks_are_ignored(self):
+        data = "2 1\n1 2\n5 6\n2\n0 0\n4\n1 1 3\n0 1 9\n3 2 9\n2 2 4\n"
+        problem = parse_input(StringIO(data))
+
+        self.assertEqual(sorted(problem.tasks), [1, 2])
+        self.assertEqual(problem.tasks[1].compatible_teams, {1: 3})
+        self.assertEqual(problem.tasks[2].compatible_teams, {2: 4})
+
     def test_parse_solution(self):
         solution_data = """3
 1 2 100
@@ -74,6 +117,12 @@ class TestParser(unittest.TestCase):
         self.assertEqual(a3.team_id, 1)
         self.assertEqual(a3.start_time, 200)
 
+    def test_truncated_solution(self):
+        with self.assertRaisesRegex(ValueError, "empty"):
+            parse_solution(StringIO(""))
+        with self.assertRaisesRegex(ValueError, "incomplete"):
+            parse_solution(StringIO("2\n1 2 100\n2 3\n"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 import time
-from paas.models import Task, ProblemInstance, Schedule, Team
+from paas.models import Assignment, Task, ProblemInstance, Schedule, Team
 from paas.middleware.simulated_annealing import SimulatedAnnealingRefiner
 
 
@@ -32,6 +32,95 @@ class TestSimulatedAnnealing(unittest.TestCase):
         self.assertLess(duration, 0.7)
         self.assertGreater(duration, 0.15)
 
+    def test_multiple_chains(self):
+        tasks = {}
+        for i in range(1, 20):
+            preds = [i - 1] if i > 1 and i % 4 else []
+            tasks[i] = Task(i, 10, preds, [], {1: 10, 2: 20})
+        teams = {1: Team(1, 0), 2: Team(2, 0)}
+        problem = ProblemInstance(len(tasks), 2, tasks, teams)
+
+        sa = SimulatedAnnealingRefiner(num_chains=2)
+        schedule = sa.map_result(problem, Schedule([]), time_limit=0.2)
+
+        self.assertEqual(len(schedule.assignments), len(tasks))
+        finish = {a.task_id: a.start_time + 10 for a in schedule.assignments}
+        for a in schedule.assignments:
+            for p in tasks[a.task_id].predecessors:
+                self.assertGreaterEqual(a.start_time, finish[p])
+
+    def test_chain_past_deadline(self):
+        # A chain that only starts after the deadline keeps the initial state
+        tasks = {i: Task(i, 10, [], [], {1: 10, 2: 20}) for i in range(1, 6)}
+        teams = {1: Team(1, 0), 2: Team(2, 0)}
+        problem = ProblemInstance(len(tasks), 2, tasks, teams)
+        schedule = Schedule([Assignment(i, 2, 10 * (i - 1)) for i in tasks])
+
+        sa = SimulatedAnnealingRefiner()
+        sa._preprocess(problem)
+        fitness, order, teams_list = sa._run_chain_until(
+            problem, schedule, 0, time.time() - 1
+        )
+
+        self.assertEqual(order, [1, 2, 3, 4, 5])
+        self.assertEqual(teams_list[1:], [2] * 5)
+        self.assertEqual(fitness, (-5, 50, 100))
+
+    def test_decode_reversed_chain(self):
+        # Chain 1 -> 2 -> ... -> 12 listed backwards: one task per pass
+        tasks = {}
+        for i in range(1, 13):
+            preds = [i - 1] if i > 1 else []
+            tasks[i] = Task(i, 5, preds, [], {1: 3})
+        teams = {1: Team(1, 2)}
+        problem = ProblemInstance(len(tasks), 1, tasks, teams)
+
+        order = list(range(12, 0, -1))
+        # Team per task id, -1 for the unused id 0
+        teams_list = [-1] * (max(tasks) + 1)
+        for tid in tasks:
+            teams_list[tid] = 1
+
+        sa = SimulatedAnnealingRefiner()
+        sa._preprocess(problem)
+        assignments, fitness = sa._evaluate(problem, order, teams_list)
+
+        self.assertEqual(
+            [(a.task_id, a.start_time) for a in assignments],
+            [(i, 2 + 5 * (i - 1)) for i in range(1, 13)],
+        )
+        self.assertEqual(fitness, (-12, 62, 36))
+
+    def test_resumed_decode_matches_full_decode(self):
+        # Chain 1 -> 2 -> ... -> 10 plus independent tasks 11..20
+        tasks = {}
+        for i in range(1, 21):
+            preds = [i - 1] if 1 < i <= 10 else []
+            tasks[i] = Task(i, i % 4 + 1, preds, [], {1: 5, 2: 7})
+        teams = {1: Team(1, 0), 2: Team(2, 3)}
+        problem = ProblemInstance(len(tasks), len(teams), tasks, teams)
+
+        order = list(range(20, 0, -1))
+        # Team per task id, -1 for the unused id 0
+        teams_list = [-1] * (max(tasks) + 1)
+        for tid in tasks:
+            teams_list[tid] = tid % 2 + 1
+        team_task_ids = [tid for tid in order if teams_list[tid] >= 0]
+
+        sa = SimulatedAnnealingRefiner()
+        sa._preprocess(problem)
+        sa._evaluate_fitness(problem, order, teams_list)
+        sa._commit_decode()
+
+        full_sa = SimulatedAnnealingRefiner()
+        full_sa._preprocess(problem)
+        for _ in range(50):
+            move, start = sa._mutate(problem, order, teams_list, team_task_ids)
+            resumed = sa._evaluate_fitness(problem, order, teams_list, start=start)
+            _, full = full_sa._evaluate(problem, order, teams_list)
+            self.assertEqual(resumed, full)
+            sa._undo_mutation(order, teams_list, move)
+
 
 if __name__ == "__main__":
     unittest.main()